@@ -0,0 +1,150 @@
+import threading
+import time
+
+from api.configurations import log_event
+
+
+class _Load:
+    """A load in flight: callers asking for the same key meanwhile wait for it and share its outcome."""
+
+    def __init__(self, generation):
+        self.generation = generation
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResultCache:
+    """Cache bridge results per user and endpoint, serving stale entries while refreshing them in the background."""
+
+    def __init__(self, ttls, max_stale=24 * 3600):
+        # ttls: {endpoint: seconds an entry stays fresh}
+        self.ttls = dict(ttls)
+        self.max_stale = max_stale
+        self._entries = {}
+        self._refreshing = set()
+        self._loading = {}  # key -> _Load of the first load in flight, which later callers wait for
+        self._generations = {}  # key -> bumped by invalidate(), so loads started before it don't store
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.joined = 0
+        self.refreshes = 0
+
+    def ttl(self, endpoint):
+        # 'logs:30:30' shares the TTL of 'logs'
+        return self.ttls.get(endpoint.split(':', 1)[0], 0)
+
+    def get(self, username, endpoint, loader, cacheable=lambda value: True):
+        """Return the cached result of loader() for this user and endpoint, loading it on a miss."""
+        key = (username, endpoint)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                stored_at, value = entry
+                age = now - stored_at
+                if age < self.ttl(endpoint):
+                    self.hits += 1
+                    return value
+                if age < self.ttl(endpoint) + self.max_stale:
+                    self.stale_hits += 1
+                    self._refresh_in_background(key, loader, cacheable)
+                    return value
+            loading = self._loading.get(key)
+            if loading is None:
+                self.misses += 1
+                loading = self._loading[key] = _Load(self._generations.get(key, 0))
+                owner = True
+            else:
+                self.joined += 1
+                owner = False
+        if not owner:
+            # Same outcome as the load in flight (e.g. the post-login warm-up), failures included, so a failing
+            # portal gets one login instead of one per caller
+            loading.done.wait()
+            with self._lock:
+                invalidated = self._generations.get(key, 0) != loading.generation
+            if invalidated:  # its value belongs to the old session; one caller loads again, the rest join it
+                return self.get(username, endpoint, loader, cacheable)
+            if loading.error is not None:
+                raise loading.error
+            return loading.value
+        try:
+            loading.value = self._load(key, loader, cacheable, loading.generation)
+            return loading.value
+        except Exception as e:
+            loading.error = e
+            raise
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            loading.done.set()
+
+    def peek(self, username, endpoint):
+        """Return the cached value (fresh or stale) without loading anything, or None."""
+        with self._lock:
+            entry = self._entries.get((username, endpoint))
+        return entry[1] if entry else None
+
+    def put(self, username, endpoint, value):
+        with self._lock:
+            self._entries[(username, endpoint)] = (time.monotonic(), value)
+
+    def _load(self, key, loader, cacheable, generation=None):
+        if generation is None:
+            with self._lock:
+                generation = self._generations.get(key, 0)
+        value = loader()
+        if cacheable(value):
+            with self._lock:
+                # Invalidated while loading (logout, user switch, connect): the value belongs to the old session
+                if self._generations.get(key, 0) == generation:
+                    self._entries[key] = (time.monotonic(), value)
+        return value
+
+    def _refresh_in_background(self, key, loader, cacheable):
+        # Called with self._lock held.
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        self.refreshes += 1
+        generation = self._generations.get(key, 0)
+
+        def refresh():
+            try:
+                self._load(key, loader, cacheable, generation)
+            except Exception as e:
+                log_event(f"Background refresh of {key[1]} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name=f"refresh-{key[1]}", daemon=True).start()
+
+    def invalidate(self, username=None, *endpoints):
+        """Drop entries of one user (optionally only some endpoints), or of everyone; loads in flight won't store."""
+        with self._lock:
+            for key in set(self._entries) | self._refreshing | set(self._loading):
+                if username is not None and key[0] != username:
+                    continue
+                if endpoints and key[1].split(':', 1)[0] not in endpoints:
+                    continue
+                self._entries.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.stale_hits + self.joined + self.misses
+        return {
+            'entries': size,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'joined_in_flight': self.joined,
+            'background_refreshes': self.refreshes,
+            'hit_ratio': round((self.hits + self.stale_hits + self.joined) / lookups, 3) if lookups else 0.0,
+            'ttls': dict(self.ttls),
+        }
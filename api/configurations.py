@@ -1,20 +1,21 @@
+import atexit
+import getpass
+import gzip
 import json
 import platform
+import queue
+import threading
+import time
 import uuid
 from pathlib import Path
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives import hashes
-from cryptography.fernet import Fernet
-from cryptography.hazmat.backends import default_backend
 import base64
 import os
 from datetime import datetime
 import shutil
-from dotenv import load_dotenv
-
-load_dotenv()
 
 MAX_LOG_SIZE = 1 * 1024 * 1024  # 1 MB
+LOG_BATCH_SIZE = 64  # records written per batch at most
+LOG_FLUSH_INTERVAL = 0.5  # seconds a record may wait in the queue
 
 def get_config_path():
     if os.name == "nt":  # Windows
@@ -31,54 +32,177 @@ CONFIG_FILE = get_config_path()
 LOG_FILE = CONFIG_FILE.with_suffix(".log")
 LOGS_DIR = CONFIG_FILE.parent / "logs"
 LOGS_DIR.mkdir(exist_ok=True)
-SECRET_KEY = os.getenv("SECRET_KEY", "fallback_secret_key")
-if SECRET_KEY is None:
-    raise ValueError("SECRET_KEY environment variable is not set")
+_key_lock = threading.Lock()
+_fernets = {}  # (system identity, SECRET_KEY) -> Fernet
+_identity = None  # get_system_identity() of this process
+_dotenv_loaded = False
+
+
 def get_system_identity():
-    user = os.getlogin().encode()
+    try:
+        user = os.getlogin().encode()
+    except OSError:  # no controlling terminal (services, some Linux sessions)
+        user = getpass.getuser().encode()
     hostname = platform.node().encode()
     mac = uuid.getnode().to_bytes(6, 'big')
     return user + hostname + mac
 
-def derive_key(salt: bytes) -> bytes:
+def get_secret_key() -> str:
+    """Read SECRET_KEY from the environment / .env (dotenv is only imported here, and .env read once)"""
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        from dotenv import load_dotenv
+
+        load_dotenv()  # never overrides the environment, so a second read would change nothing
+        _dotenv_loaded = True
+    secret_key = os.getenv("SECRET_KEY", "fallback_secret_key")
+    if secret_key is None:
+        raise ValueError("SECRET_KEY environment variable is not set")
+    return secret_key
+
+def derive_key(salt: bytes, secret_key: str = None) -> bytes:
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
     kdf = PBKDF2HMAC(
         algorithm=hashes.SHA256(),
         length=32,
-        salt = SECRET_KEY.encode(),
+        salt = (secret_key or get_secret_key()).encode(),
         iterations=100_000,
         backend=default_backend()
     )
     return base64.urlsafe_b64encode(kdf.derive(salt))
 
 def get_fernet():
-    identity = get_system_identity()
-    key = derive_key(identity)
-    return Fernet(key)
-
-def rotate_log():
-    """Rotate log file if too big, move to logs folder"""
-    if LOG_FILE.exists() and LOG_FILE.stat().st_size > MAX_LOG_SIZE:
-        backup_name = LOGS_DIR / f"sharif_config_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log.bak"
-        shutil.move(LOG_FILE, backup_name)
-
-def log_event(message: str):
-    """Write log message to file with rotation"""
-    rotate_log()
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(f"[{timestamp}] {message}\n")
-
-def mask_and_encrypt_values(data: dict) -> dict:
-    """Encrypt only values, keep keys in plain text"""
-    fernet = get_fernet()
-    masked = {}
-    for k, v in data.items():
-        if isinstance(v, (str, int, float, bool)):
-            val_str = str(v)
-            masked[k] = fernet.encrypt(val_str.encode()).decode()
-        else:
-            masked[k] = fernet.encrypt(json.dumps(v).encode()).decode()
-    return masked
+    """Return the Fernet for this machine, deriving its key once per identity and SECRET_KEY"""
+    from cryptography.fernet import Fernet
+
+    global _identity
+    if _identity is None:
+        _identity = get_system_identity()
+    source = (_identity, get_secret_key())
+    with _key_lock:
+        fernet = _fernets.get(source)
+        if fernet is None:
+            fernet = _fernets[source] = Fernet(derive_key(*source))
+        return fernet
+
+class _LogWriter:
+    """Append queued log records to LOG_FILE from a background thread, a batch at a time.
+
+    The size of the log is tracked in memory (one stat at start), so rotation needs no stat per write;
+    rotated files are gzipped into LOGS_DIR.
+    """
+
+    def __init__(self, path, max_size=MAX_LOG_SIZE, batch_size=LOG_BATCH_SIZE, interval=LOG_FLUSH_INTERVAL):
+        self.path = path
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = queue.SimpleQueue()
+        self._file = None
+        self._size = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def put(self, record):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+        self._queue.put(record)
+
+    def flush(self, timeout=2.0):
+        """Block until everything queued so far is on disk (or timeout seconds passed)."""
+        if self._thread is None or not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _run(self):
+        batch = []
+        waiters = []
+        deadline = None
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()) if batch else None)
+            except queue.Empty:
+                item = None
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+            elif item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.interval
+                batch.append(item)
+                if len(batch) < self.batch_size and time.monotonic() < deadline:
+                    continue
+            if batch:
+                try:
+                    self._write(batch)
+                except OSError:
+                    self._close()
+                batch = []
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
+
+    def _write(self, records):
+        data = "".join(format_record(r) for r in records).encode("utf-8")
+        if self._file is None:
+            self._file = open(self.path, "ab")
+            self._size = self._file.tell()
+        if self._size + len(data) > self.max_size and self._size > 0:
+            self._rotate()
+            self._file = open(self.path, "ab")
+            self._size = 0
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _rotate(self):
+        """Move the full log into LOGS_DIR and gzip it."""
+        self._close()
+        backup = LOGS_DIR / f"{self.path.stem}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.log"
+        shutil.move(self.path, backup)
+        with open(backup, "rb") as source, gzip.open(backup.with_suffix(".log.gz"), "wb") as target:
+            shutil.copyfileobj(source, target)
+        backup.unlink()
+
+
+def format_record(record):
+    line = f"[{record['time']}] {record['message']}"
+    if record['fields']:
+        line += " " + json.dumps(record['fields'], ensure_ascii=False, default=str)
+    return line + "\n"
+
+
+_log_writer = _LogWriter(LOG_FILE)
+
+
+def log_event(message: str, **fields):
+    """Queue a log line (plus optional structured fields); a background thread writes it to the log file"""
+    _log_writer.put({
+        'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'message': message,
+        'fields': fields,
+    })
+
+def flush_log(timeout=2.0):
+    """Wait until the queued log lines are written"""
+    return _log_writer.flush(timeout)
+
+def mask_values(data: dict) -> dict:
+    """Keep keys in plain text and hide the values"""
+    return {k: "***" for k in data}
 
 def save_config(data: dict):
     fernet = get_fernet()
@@ -86,8 +210,8 @@ def save_config(data: dict):
     encrypted = fernet.encrypt(json_data)
     CONFIG_FILE.write_bytes(encrypted)
 
-    # Log with keys visible, values encrypted
-    masked_data = mask_and_encrypt_values(data)
+    # Log with keys visible, values hidden
+    masked_data = mask_values(data)
     log_event(f"Config saved. Data: {json.dumps(masked_data)}")
 
 def load_config() -> dict:
@@ -99,7 +223,7 @@ def load_config() -> dict:
         decrypted = fernet.decrypt(CONFIG_FILE.read_bytes())
         data = json.loads(decrypted.decode())
 
-        masked_data = mask_and_encrypt_values(data)
+        masked_data = mask_values(data)
         log_event(f"Config loaded. Data: {json.dumps(masked_data)}")
         return data
     except Exception as e:
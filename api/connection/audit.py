@@ -0,0 +1,202 @@
+"""
+Bulk audit of the online net.sharif.ir sessions of many accounts (lab and service accounts).
+
+At most `concurrency` accounts are worked on at once, every request to the portal goes through a per-host
+token bucket, and logins are kept in a size-capped session pool, so re-running an audit (e.g. from the
+daemon) reuses them instead of logging every account in again. The audit sessions have their own transport
+adapter, so the token bucket never throttles the app's own requests.
+"""
+import csv
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from api import transport
+from api.configurations import log_event
+from api.connection import inside
+from api.session_pool import LoginError, SessionExpired, SessionPool
+
+AUDIT_CONCURRENCY = 8  # accounts worked on at once (each needs up to 3 requests to log in, 2 to list)
+AUDIT_RATE = 5.0  # requests per second to the portal
+AUDIT_BURST = 10
+AUDIT_MAX_SESSIONS = 256  # logged-in accounts kept between audits
+
+REPORT_FIELDS = ('account', 'ras_ip', 'session_ip', 'session_id', 'session_start_time')
+START_TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y/%m/%d %H:%M:%S")
+
+_pool = None
+# Same retries and circuit breaker as the app's transport, but its own connection pools and rate limits
+_adapter = transport.TransportAdapter(transport.breaker, pool_connections=4, pool_maxsize=2 * AUDIT_CONCURRENCY)
+
+
+def audit_login(username, password):
+    return inside.get_session(username, password, transport.new_session(_adapter))
+
+
+def get_audit_pool():
+    """Sessions of audited accounts, apart from the app's own pool (and never written to the cookie store)."""
+    global _pool
+    if _pool is None:
+        _pool = SessionPool("net.sharif.ir audit", audit_login, max_sessions=AUDIT_MAX_SESSIONS)
+    return _pool
+
+
+def load_credentials(path):
+    """Read `username,password` rows (CSV; blank lines and lines starting with # are skipped)."""
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = [row for row in csv.reader(f) if row and not row[0].lstrip().startswith('#')]
+    return [(row[0].strip(), row[1]) for row in rows if len(row) >= 2 and row[0].strip()]
+
+
+def parse_start_time(value):
+    for fmt in START_TIME_FORMATS:
+        try:
+            return datetime.strptime(value or '', fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_duration(text):
+    """'90', '90s', '30m', '12h' or '2d' -> seconds."""
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    text = text.strip().lower()
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+class KillRules:
+    """Which online sessions count as stale. With no rule set, nothing is.
+
+    older_than: seconds since session_start_time; keep_newest: sessions per account to keep (newest first);
+    ras_ips: sessions on these RAS servers.
+    """
+
+    def __init__(self, older_than=None, keep_newest=None, ras_ips=()):
+        self.older_than = older_than
+        self.keep_newest = keep_newest
+        self.ras_ips = set(ras_ips)
+
+    def __bool__(self):
+        return self.older_than is not None or self.keep_newest is not None or bool(self.ras_ips)
+
+    def select(self, rows, now=None):
+        """Return the rows to disconnect, each with the 'reason' it matched."""
+        now = now or datetime.now()
+        stale = {}
+        by_account = {}
+        for row in rows:
+            by_account.setdefault(row['account'], []).append(row)
+            started = parse_start_time(row.get('session_start_time'))
+            if self.older_than is not None and started and (now - started).total_seconds() > self.older_than:
+                stale[id(row)] = dict(row, reason=f"older than {self.older_than:.0f}s")
+            elif row.get('ras_ip') in self.ras_ips:
+                stale[id(row)] = dict(row, reason=f"on RAS {row['ras_ip']}")
+        if self.keep_newest is not None:
+            for account_rows in by_account.values():
+                ordered = sorted(account_rows, key=lambda r: parse_start_time(r.get('session_start_time'))
+                                 or datetime.min, reverse=True)
+                for row in ordered[self.keep_newest:]:
+                    stale.setdefault(id(row), dict(row, reason=f"beyond the newest {self.keep_newest}"))
+        return [stale[id(row)] for row in rows if id(row) in stale]
+
+
+class SessionAuditor:
+    """List (and optionally disconnect) the online sessions of many accounts with bounded concurrency."""
+
+    def __init__(self, concurrency=AUDIT_CONCURRENCY, rate=AUDIT_RATE, burst=AUDIT_BURST, pool=None):
+        self.concurrency = max(1, concurrency)
+        self.rate = rate
+        self.burst = burst
+        self.pool = pool or get_audit_pool()
+
+    def audit(self, credentials, rules=None, kill=False):
+        """Fetch the sessions of every (username, password); with kill, disconnect those the rules select.
+
+        Returns {'rows', 'errors', 'stale', 'killed', 'summary'}; without kill, 'stale' is what would go.
+        """
+        started = time.perf_counter()
+        pool_before = self.pool.stats()
+        host = urlsplit(inside.origin).netloc
+        previous = _adapter.rate_limits.get(host)
+        bucket = transport.TokenBucket(self.rate, self.burst) if self.rate else None
+        if bucket is not None:
+            _adapter.rate_limits[host] = bucket
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="audit") as executor:
+                fetched = list(executor.map(lambda cred: self._fetch(*cred), credentials))
+                rows = [row for account_rows, _ in fetched for row in account_rows]
+                errors = [error for _, error in fetched if error]
+                stale = rules.select(rows) if rules else []
+                killed = []
+                if kill and stale:
+                    passwords = dict(credentials)
+                    targets = {}
+                    for row in stale:
+                        targets.setdefault(row['account'], []).append(row)
+                    for results in executor.map(lambda item: self._kill(item[0], passwords[item[0]], item[1]),
+                                                targets.items()):
+                        killed.extend(results)
+        finally:
+            if bucket is not None:
+                if previous is None:
+                    _adapter.rate_limits.pop(host, None)
+                else:
+                    _adapter.rate_limits[host] = previous
+        pool_after = self.pool.stats()
+        summary = {
+            'accounts': len(credentials),
+            'failed_accounts': len(errors),
+            'sessions': len(rows),
+            'stale': len(stale),
+            'killed': sum(1 for result in killed if result['success']),
+            'logins': pool_after['misses'] - pool_before['misses'] + pool_after['relogins'] - pool_before['relogins'],
+            'reused_logins': pool_after['hits'] - pool_before['hits'],
+            'throttled_s': round(bucket.waited, 3) if bucket is not None else 0.0,
+            'wall_ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+        log_event("Session audit finished", **summary)
+        return {'rows': rows, 'errors': errors, 'stale': stale, 'killed': killed, 'summary': summary}
+
+    def _fetch(self, username, password):
+        # Anything wrong with one account (including an odd answer) is recorded for it; the audit goes on
+        try:
+            success, data, _ = self.pool.run(username, password, inside.fetch_online_sessions)
+            if not success:
+                return [], {'account': username, 'error': data}
+            result = data.get('result') if isinstance(data, dict) else None
+            if not result or not isinstance(result[0], list):
+                return [], {'account': username, 'error': f"Unexpected sessions answer: {str(data)[:200]}"}
+            return [dict({field: s.get(field) for field in REPORT_FIELDS[1:]}, account=username)
+                    for s in result[0]], None
+        except LoginError as e:
+            return [], {'account': username, 'error': f"Login failed: {e}"}
+        except SessionExpired:
+            return [], {'account': username, 'error': "Logged out by the portal"}
+        except Exception as e:
+            return [], {'account': username, 'error': str(e)}
+
+    def _kill(self, username, password, rows):
+        def disconnect_all(session):
+            results = []
+            for row in rows:
+                response = inside.request_disconnect(session, row['ras_ip'], row['session_ip'], row['session_id'])
+                inside.check_logged_in(response)
+                results.append(dict(row, success=response.status_code == 200,
+                                    message=f"Status code {response.status_code}"))
+            return results
+
+        try:
+            return self.pool.run(username, password, disconnect_all)
+        except Exception as e:
+            return [dict(row, success=False, message=str(e)) for row in rows]
+
+
+def write_report(rows, path):
+    """Write the consolidated report as CSV (account, ras_ip, session_ip, session_id, session_start_time)."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
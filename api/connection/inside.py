@@ -1,10 +1,17 @@
 
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
-from bs4 import BeautifulSoup
 
+from api import metrics
 from api.configurations import log_event
+from api.html_extract import extract_inputs
+from api.cookie_store import get_cookie_store
+from api.session_pool import LoginError, SessionExpired, SessionPool
+from api.transport import TIMEOUTS, new_session
 
 origin = "https://net.sharif.ir"
+cookie_domain = "net.sharif.ir"
 login_url = "https://net.sharif.ir/en-us/user/login/"
 home_url = "https://net.sharif.ir/en-us/user/home/"
 connect_url = "https://net.sharif.ir/en-us/user/aaa_ras_connect/"
@@ -23,18 +30,16 @@ def get_cookie_value(cookies, name, domain=None, path=None):
     return None
 
 
-def get_session(username, password):
-    session = requests.session()
-    response = session.get(login_url)
+def get_session(username, password, session=None):
+    session = new_session() if session is None else session
+    response = session.get(login_url, timeout=TIMEOUTS['auth'])
     if response.status_code != 200:
-        return False, "Failed to load main page"
+        return False, "Failed to load main page", None
 
-    soup = BeautifulSoup(response.text, "html.parser")
-    csrf_token_input = soup.find("input", attrs={"name": "csrfmiddlewaretoken"})
-    if not csrf_token_input:
-        return False, "CSRF token input not found in login form"
-
-    csrf_token = csrf_token_input["value"]
+    with metrics.timed("parse", "net.sharif.ir login form"):
+        csrf_token = extract_inputs(response.text, ["csrfmiddlewaretoken"]).get("csrfmiddlewaretoken")
+    if csrf_token is None:
+        return False, "CSRF token input not found in login form", None
 
     headers = {
         "Content-Type": "application/x-www-form-urlencoded",
@@ -49,25 +54,43 @@ def get_session(username, password):
         "password": password,
     }
 
-    post_resp = session.post(login_url, headers=headers, data=data)
+    post_resp = session.post(login_url, headers=headers, data=data, timeout=TIMEOUTS['auth'])
     if post_resp.status_code != 200 and post_resp.status_code != 302:
-        return False, f"Login failed: Status {post_resp.status_code}"
+        return False, f"Login failed: Status {post_resp.status_code}", None
 
     return True, "Login successful", session
 
 
+session_pool = SessionPool("net.sharif.ir", get_session, get_cookie_store())
+
+
+def check_logged_in(response):
+    """Raise SessionExpired if net.sharif.ir bounced the request to its login page."""
+    if response.url.startswith(login_url) or response.status_code in (401, 403):
+        raise SessionExpired(response.url)
+
+
+def load_home(session):
+    response = session.get(home_url, timeout=TIMEOUTS['page'])
+    check_logged_in(response)
+    if response.status_code == 200 and "ورود" in response.text.lower():
+        raise SessionExpired(response.url)
+    return response
+
+
 def connect_via_requests(username, password) -> (bool,str):
-    result, massage, session = get_session(username, password)
-    if result is False:
-        return False, massage
+    try:
+        response, session = session_pool.run(username, password, lambda s: (load_home(s), s))
+    except LoginError as e:
+        return False, str(e)
+    except SessionExpired:
+        return False, "Failed to load main page"
     # Step 1: Get the home page for test
-    response = session.get(home_url)
     if response.status_code != 200:
         return False, "Failed to load main page"
 
-    for cookie in session.cookies:
-        log_event(f"{cookie.name, cookie.value, cookie.domain, cookie.path}")
-    csrf_token = get_cookie_value(session.cookies, "csrftoken", domain="net.sharif.ir")
+    log_event("net.sharif.ir cookies", names=sorted({cookie.name for cookie in session.cookies}))
+    csrf_token = get_cookie_value(session.cookies, "csrftoken", domain=cookie_domain)
 
     if not csrf_token:
         return False, "CSRF token not found in cookies"
@@ -84,7 +107,7 @@ def connect_via_requests(username, password) -> (bool,str):
     }
 
     try:
-        post_response = session.post(connect_url, headers=headers, data=data)
+        post_response = session.post(connect_url, headers=headers, data=data, timeout=TIMEOUTS['json'])
         if post_response.status_code == 200:
             return True, "Login POST sent successfully"
         else:
@@ -93,39 +116,53 @@ def connect_via_requests(username, password) -> (bool,str):
         return False, f"Request failed: {e}"
 
 
-def get_online_sessions(username, password):
-
-    result, message, session = get_session(username, password)
-    if not result:
-        return False, message, session
-
-    csrf_token = get_cookie_value(session.cookies, "csrftoken", domain="net.sharif.ir")
+def fetch_online_sessions(session):
+    csrf_token = get_cookie_value(session.cookies, "csrftoken", domain=cookie_domain)
     if not csrf_token:
-        return False, "CSRF token not found in cookies", session
+        raise SessionExpired("CSRF token not found in cookies")
 
-    try:
-        home_resp = session.get(home_url)
-        if home_resp.status_code != 200 or "ورود" in home_resp.text.lower():
-            return False, "شما وارد نشده‌اید یا صفحه لاگین برگشت داده شده است.", session
+    home_resp = load_home(session)
+    if home_resp.status_code != 200:
+        return False, "شما وارد نشده‌اید یا صفحه لاگین برگشت داده شده است.", session
+
+    headers = {
+        'Referer': home_url,
+        'X-CSRFToken': csrf_token,
+        'X-Requested-With': 'XMLHttpRequest',
 
-        headers = {
-            'Referer': home_url,
-            'X-CSRFToken': csrf_token,
-            'X-Requested-With': 'XMLHttpRequest',
+    }
 
-        }
+    response = session.get(sessions_url, headers=headers, timeout=TIMEOUTS['json'])
+    check_logged_in(response)
 
-        response = session.get(sessions_url, headers=headers)
+    if response.status_code != 200 or "Home" in response.text.lower():
+        return False, f"خطا: وضعیت پاسخ {response.status_code}", session
 
-        if response.status_code != 200 or "Home" in response.text.lower():
-            return False, f"خطا: وضعیت پاسخ {response.status_code}", session
+    data = response.json()
+    return True, data, session
 
-        data = response.json()
-        return True, data, session
 
+def get_online_sessions(username, password):
+    try:
+        return session_pool.run(username, password, fetch_online_sessions)
+    except LoginError as e:
+        return False, str(e), None
+    except SessionExpired:
+        return False, "شما وارد نشده‌اید یا صفحه لاگین برگشت داده شده است.", None
     except Exception as e:
         log_event(f"❌ Error fetching sessions: {e}")
-        return False, f"❌ Error fetching sessions: {e}", session
+        return False, f"❌ Error fetching sessions: {e}", None
+
+
+def request_disconnect(session, ras_ip, session_ip, session_id):
+    url = f"{disconnect_url}?user_id=0&ras={ras_ip}&ip={session_ip}&u_id={session_id}"
+    csrf_token = get_cookie_value(session.cookies, "csrftoken", domain=cookie_domain)
+    headers = {
+        "X-CSRFToken": csrf_token,
+        "X-Requested-With": "XMLHttpRequest",
+        "Referer": home_url,
+    }
+    return session.get(url, headers=headers, timeout=TIMEOUTS['json'])
 
 
 def disconnect_session(session, ras_ip, session_ip, session_id):
@@ -133,15 +170,7 @@ def disconnect_session(session, ras_ip, session_ip, session_id):
     Disconnect a specific session with the given parameters.
     """
     try:
-
-        url = f"{disconnect_url}?user_id=0&ras={ras_ip}&ip={session_ip}&u_id={session_id}"
-        csrf_token = get_cookie_value(session.cookies, "csrftoken", domain="net.sharif.ir")
-        headers = {
-            "X-CSRFToken": csrf_token,
-            "X-Requested-With": "XMLHttpRequest",
-            "Referer": home_url,
-        }
-        response = session.get(url, headers=headers)
+        response = request_disconnect(session, ras_ip, session_ip, session_id)
         if response.status_code == 200:
             return True, f"✅ Disconnected: {session_id} ({session_ip})"
         else:
@@ -177,3 +206,62 @@ def disconnect_current_session(username, password):
     except Exception as e:
         success, msg = False, str(e)
     return success, msg
+
+
+def disconnect_sessions(username, password, targets, max_workers=3):
+    """
+    Disconnect several sessions with a single login.
+    targets: dicts with ras_ip, session_ip and session_id (as returned by get_online_sessions).
+    Returns (True, results, sessions_json) with one result per target and the session list fetched afterwards.
+    """
+    def disconnect_all(session):
+        def disconnect_one(target):
+            response = request_disconnect(session, target.get("ras_ip"), target.get("session_ip"),
+                                          target.get("session_id"))
+            check_logged_in(response)
+            return response.status_code
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(targets)))) as executor:
+            futures = [executor.submit(disconnect_one, target) for target in targets]
+        results = []
+        for target, future in zip(targets, futures):
+            try:
+                status = future.result()
+                ok, message = status == 200, f"Status code {status}"
+            except SessionExpired:
+                raise
+            except Exception as e:
+                ok, message = False, str(e)
+            results.append({
+                "session_id": target.get("session_id"),
+                "session_ip": target.get("session_ip"),
+                "ras_ip": target.get("ras_ip"),
+                "success": ok,
+                "message": message,
+            })
+        return results
+
+    if not targets:
+        return True, [], None
+    try:
+        results = session_pool.run(username, password, disconnect_all)
+    except LoginError as e:
+        return False, str(e), None
+    except SessionExpired:
+        return False, "شما وارد نشده‌اید یا صفحه لاگین برگشت داده شده است.", None
+
+    success, sessions_json, _ = get_online_sessions(username, password)
+    return True, results, sessions_json if success else None
+
+
+def disconnect_other_sessions(username, password):
+    """Disconnect every online session except the one of this machine's IP."""
+    success, response_json, _ = get_online_sessions(username, password)
+    if not success:
+        return False, response_json, None
+    sessions = response_json.get("result", [[]])[0]
+    current_ip = response_json.get("ip")
+    others = [s for s in sessions if s.get("session_ip") != current_ip]
+    if not others:
+        return True, [], response_json
+    return disconnect_sessions(username, password, others)
@@ -0,0 +1,124 @@
+import ipaddress
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from api.configurations import log_event
+
+IP_SOURCES = [
+    "https://icanhazip.com/",
+    "https://api.ipify.org/",
+    "https://checkip.amazonaws.com/",
+    "https://ifconfig.me/ip",
+]
+IP_DEADLINE = 2.0  # seconds, worst case for a whole resolve
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="ip")
+
+
+def fetch_ip(url):
+    """Ask one plain-text 'what is my IP' service."""
+    from api import transport
+
+    response = transport.request("GET", url, endpoint="ip")
+    return response.text if response.status_code == 200 else None
+
+
+def valid_ip(text):
+    try:
+        return str(ipaddress.ip_address((text or "").strip()))
+    except ValueError:
+        return None
+
+
+class IpResolver:
+    """Race several IP sources, keep the first valid answer until invalidate() (e.g. on a state change)."""
+
+    def __init__(self, sources=None, deadline=IP_DEADLINE, on_change=None):
+        # name -> fn() returning an IP string or None
+        self._sources = {url: (lambda url=url: fetch_ip(url)) for url in (IP_SOURCES if sources is None else sources)}
+        self.deadline = deadline
+        self._on_change = on_change
+        self._ip = None
+        self._report = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._resolving = None  # Event of the resolve in flight
+
+    def add_source(self, name, fn):
+        self._sources[name] = fn
+
+    def get(self):
+        """Return the cached IP, or None if it has to be resolved first (no network access)."""
+        return self._ip
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._ip = None
+
+    def resolve(self, deadline=None):
+        """Return the cached IP or race the sources for it; "" if none answered within the deadline."""
+        with self._lock:
+            if self._ip is not None:
+                return self._ip
+            running = self._resolving
+            if running is None:
+                running = self._resolving = threading.Event()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            running.wait((deadline or self.deadline) + 0.5)
+            return self._ip or ""
+        try:
+            return self._race(deadline or self.deadline)
+        finally:
+            with self._lock:
+                self._resolving = None
+            running.set()
+
+    def refresh_async(self):
+        """Resolve in the background if nothing is cached (on_change reports the answer)."""
+        if self._ip is None and self._resolving is None:
+            threading.Thread(target=self.resolve, name="ip-resolve", daemon=True).start()
+
+    def _race(self, deadline):
+        generation = self._generation
+        started = time.perf_counter()
+        futures = {_executor.submit(fn): name for name, fn in self._sources.items()}
+        pending = set(futures)
+        ip = winner = None
+        while pending and ip is None:
+            remaining = deadline - (time.perf_counter() - started)
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    ip = valid_ip(future.result())
+                except Exception:
+                    ip = None
+                if ip is not None:
+                    winner = futures[future]
+                    break
+        for future in pending:
+            future.cancel()
+        latency = round((time.perf_counter() - started) * 1000, 1)
+        with self._lock:
+            self._report = {'ip': ip, 'source': winner, 'latency_ms': latency, 'timed_out': ip is None}
+            # A state change while racing may have made the answer stale: hand it back but don't keep it
+            fresh = generation == self._generation
+            if ip is not None and fresh:
+                self._ip = ip
+        if ip is None:
+            log_event(f"No IP source answered within {deadline}s")
+            return ""
+        if fresh and self._on_change:
+            self._on_change(ip)
+        return ip
+
+    def report(self):
+        """Return the source, latency and result of the last race."""
+        with self._lock:
+            return dict(self._report, cached=self._ip)
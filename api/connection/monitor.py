@@ -0,0 +1,74 @@
+import threading
+import time
+
+from api.configurations import log_event
+from api.connection.network import check_sharif_network
+
+
+class StateMonitor:
+    """Keep the connection state current from a background thread and report only changes."""
+
+    def __init__(self, probe=check_sharif_network, min_interval=1.0, max_interval=15.0, fast_period=10.0):
+        self.state = -1
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.fast_period = fast_period
+        self._probe = probe
+        self._listeners = []
+        self._interval = min_interval
+        self._fast_until = 0.0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_listener(self, callback):
+        """Register callback(old_state, new_state), called on every state change."""
+        self._listeners.append(callback)
+
+    def start(self):
+        if self._thread and self._thread.is_alive() and not self._stop.is_set():
+            return
+        # A thread told to stop may still be finishing its probe; it keeps its own (set) Event and exits,
+        # and the new thread gets a fresh one
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop,), name="state-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def kick(self):
+        """Probe right away and keep probing fast for a while (e.g. after connect/disconnect)."""
+        self._fast_until = time.monotonic() + self.fast_period
+        self._interval = self.min_interval
+        self._wake.set()
+
+    def refresh(self):
+        """Probe synchronously and return the fresh state."""
+        with self._lock:
+            state = self._probe()
+            old, self.state = self.state, state
+        if state != old:
+            self._notify(old, state)
+        return state
+
+    def _notify(self, old, new):
+        for callback in self._listeners:
+            try:
+                callback(old, new)
+            except Exception as e:
+                log_event(f"State listener failed: {e}")
+
+    def _run(self, stop):
+        while not stop.is_set():
+            old = self.state
+            state = self.refresh()
+            if state != old or time.monotonic() < self._fast_until:
+                self._interval = self.min_interval
+            else:
+                # Nothing changed: back off until the next kick or change.
+                self._interval = min(self._interval * 2, self.max_interval)
+            self._wake.wait(self._interval)
+            self._wake.clear()
@@ -1,33 +1,64 @@
-import subprocess
-import requests
+import socket
+import ssl
+import struct
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
+from api import metrics
 
-def ping(host, timeout=200):
-    """Ping host quickly (timeout in ms)."""
+SHARIF_DNS_SERVERS = ["172.26.146.34", "172.26.146.35"]
+DNS_PORT = 53
+PORTAL_HOST = ("net.sharif.ir", 443)
+INTERNET_HOSTS = [("www.google.com", 443), ("www.cloudflare.com", 443), ("1.1.1.1", 443)]
+PROBE_TIMEOUT = 0.5  # seconds, per probe
+PROBE_DEADLINE = 1.0  # seconds, worst case for a whole state check
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="probe")
+_report_lock = threading.Lock()
+_last_report = {}
+_tls_context = None
+
+
+def tcp_probe(host, port=443, timeout=PROBE_TIMEOUT):
+    """Check that a TCP handshake with host:port completes."""
     try:
-        subprocess.check_output(
-            ["ping", "-n", "1", "-w", str(timeout), host],
-            stderr=subprocess.DEVNULL,
-            creationflags=subprocess.CREATE_NO_WINDOW
-        )
-        return True
-    except subprocess.CalledProcessError:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
         return False
 
 
-def check_public_internet():
-    """Check fast internet access."""
-    test_hosts = [
-        "https://www.google.com",
-        "https://www.cloudflare.com",
-    ]
-    for host in test_hosts:
-        try:
-            requests.head(host, timeout=0.5)
-            return True
-        except requests.RequestException:
-            continue
-    return ping("1.1.1.1", timeout=200)
+def tls_probe(host, port=443, timeout=PROBE_TIMEOUT):
+    """Check that a TLS handshake with host:port completes with a valid certificate for host.
+
+    A captive portal that intercepts :443 accepts the TCP connection, but it cannot show the host's certificate.
+    """
+    global _tls_context
+    if _tls_context is None:
+        _tls_context = ssl.create_default_context()  # loads the CA store once
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            with _tls_context.wrap_socket(sock, server_hostname=host):
+                return True
+    except OSError:  # includes ssl.SSLError and certificate errors
+        return False
+
+
+def dns_probe(server, timeout=PROBE_TIMEOUT, name="net.sharif.ir"):
+    """Check that a DNS server answers a UDP query (any answer means it is reachable)."""
+    query_id = int(time.monotonic() * 1000) & 0xFFFF
+    header = struct.pack(">HHHHHH", query_id, 0x0100, 1, 0, 0, 0)
+    question = b"".join(bytes([len(part)]) + part.encode() for part in name.split(".")) + b"\0"
+    packet = header + question + struct.pack(">HH", 1, 1)
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(timeout)
+            sock.sendto(packet, (server, DNS_PORT))
+            data = sock.recv(512)
+            return data[:2] == packet[:2]
+    except OSError:
+        return False
 
 
 """
@@ -37,24 +68,77 @@ def check_public_internet():
 | 3  | Inside - connect to Sharif network - without internet |
 """
 
-def check_sharif_network():
+def _decide(results):
+    """Return the state if the probe results collected so far settle it, else None."""
+    dns = [results.get(("dns", server)) for server in SHARIF_DNS_SERVERS]
+    portal = results.get(("portal", PORTAL_HOST[0]))
+    internet = [results.get(("internet", host)) for host, _ in INTERNET_HOSTS]
+
+    if all(r is False for r in dns):
+        return 0
+    if True not in dns:
+        return None
+    if portal is False:
+        return 1
+    if portal is None:
+        return None
+    if True in internet:
+        return 2
+    if all(r is False for r in internet):
+        return 3
+    return None
+
+
+def check_sharif_network(deadline=PROBE_DEADLINE):
     """Return Sharif connection state as quickly as possible."""
-    sharif_ns1 = "172.26.146.34"
-    sharif_ns2 = "172.26.146.35"
+    started = time.perf_counter()
+    futures = {}
+    for server in SHARIF_DNS_SERVERS:
+        futures[_executor.submit(dns_probe, server)] = ("dns", server)
+    futures[_executor.submit(tcp_probe, *PORTAL_HOST)] = ("portal", PORTAL_HOST[0])
+    for host, port in INTERNET_HOSTS:
+        futures[_executor.submit(tls_probe, host, port)] = ("internet", host)
 
-    if ping(sharif_ns1) or ping(sharif_ns2):
-        if ping("net.sharif.ir"):
-            return 2 if check_public_internet() else 3
-        else:
-            return 1
-    return 0
+    results = {}
+    timings = {}
+    pending = set(futures)
+    state = None
+    while pending and state is None:
+        remaining = deadline - (time.perf_counter() - started)
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            kind, host = futures[future]
+            results[kind, host] = future.result()
+            timings[f"{kind}:{host}"] = round((time.perf_counter() - started) * 1000, 1)
+            metrics.record("probe", f"{kind}:{host}", timings[f"{kind}:{host}"], ok=results[kind, host])
+        state = _decide(results)
 
-def get_ip_address():
-    try:
-        response = requests.get("https://icanhazip.com/")
-        if response.status_code == 200:
-            return response.text
-        else:
-            return ""
-    except Exception as e:
-        return False
\ No newline at end of file
+    timed_out = state is None
+    if timed_out:
+        # Anything still running past the deadline counts as unreachable.
+        for future in pending:
+            results.setdefault(futures[future], False)
+        state = _decide(results)
+    for future in pending:
+        future.cancel()
+
+    with _report_lock:
+        _last_report.clear()
+        _last_report.update({
+            'state': state,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 1),
+            'deadline_ms': deadline * 1000,
+            'timed_out': timed_out,
+            'probes': {f"{kind}:{host}": ok for (kind, host), ok in results.items()},
+            'probe_ms': timings,
+        })
+        metrics.record("probe", "state_check", _last_report['latency_ms'], state=state, timed_out=timed_out)
+    return state
+
+
+def get_probe_report():
+    """Return details of the last state check (latency, deadline, per-probe results)."""
+    with _report_lock:
+        return dict(_last_report)
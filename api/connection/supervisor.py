@@ -0,0 +1,155 @@
+import random
+import threading
+import time
+from collections import deque
+
+from api.configurations import log_event
+
+UP_STATES = (1, 2)  # connected outside (VPN) / inside (portal)
+DOWN_STATES = (0, 3)  # outside without VPN / inside without the portal login
+
+
+class ReconnectSupervisor:
+    """Bring the link back after a drop while auto_connect is on.
+
+    Listens to the StateMonitor; while enabled it keeps the monitor's idle interval at `watch_interval`, so a
+    drop is seen within watch_interval + one probe deadline. Reconnects go through `reconnect()` (which picks
+    the inside or VPN path from the fresh state) with jittered exponential backoff, and at most `max_attempts`
+    attempts per `window` seconds.
+    """
+
+    def __init__(self, monitor, reconnect, watch_interval=5.0, min_backoff=2.0, max_backoff=60.0,
+                 max_attempts=5, window=300.0):
+        self.enabled = False
+        self.wanted = False  # the user wants the link up (connected, or logged in with auto_connect)
+        self.watch_interval = watch_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.window = window
+        self._monitor = monitor
+        self._reconnect = reconnect
+        self._idle_interval = monitor.max_interval
+        self._dropped_at = None  # monotonic time the current outage was detected
+        self._attempt_times = deque()
+        self._latencies = deque(maxlen=100)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.drops = 0
+        self.attempts = 0
+        self.failures = 0
+        self.rate_limited = 0
+        monitor.add_listener(self._on_state_change)
+
+    def set_enabled(self, enabled):
+        self.enabled = bool(enabled)
+        self._monitor.max_interval = self.watch_interval if self.enabled else self._idle_interval
+        if self.enabled:
+            self._check(self._monitor.state)
+        else:
+            self._wake.set()
+
+    def want(self, wanted):
+        """Record whether the user wants the link up; a user disconnect must not be undone."""
+        self.wanted = bool(wanted)
+        if not self.wanted:
+            with self._lock:
+                self._dropped_at = None
+            self._wake.set()
+        else:
+            self._check(self._monitor.state)
+
+    def _on_state_change(self, old_state, new_state):
+        if new_state in UP_STATES:
+            with self._lock:
+                dropped_at, self._dropped_at = self._dropped_at, None
+            if dropped_at is not None:
+                latency = (time.monotonic() - dropped_at) * 1000
+                self._latencies.append(latency)
+                log_event(f"Link restored after {latency:.0f} ms (state {old_state} -> {new_state})")
+                self._wake.set()
+        else:
+            self._check(new_state)
+
+    def _check(self, state):
+        if not (self.enabled and self.wanted and state in DOWN_STATES):
+            return
+        with self._lock:
+            if self._dropped_at is not None:
+                return
+            self._dropped_at = time.monotonic()
+            self.drops += 1
+            if self._thread is None:
+                self._wake.clear()
+                self._thread = threading.Thread(target=self._run, name="reconnect", daemon=True)
+                self._thread.start()
+        log_event(f"Link down (state {state}), reconnecting")
+
+    def _active(self):
+        return self.enabled and self.wanted and self._dropped_at is not None
+
+    def _wait_for_slot(self):
+        # Rate limit: at most max_attempts reconnects in any window
+        while self._active():
+            now = time.monotonic()
+            while self._attempt_times and now - self._attempt_times[0] > self.window:
+                self._attempt_times.popleft()
+            if len(self._attempt_times) < self.max_attempts:
+                self._attempt_times.append(now)
+                return True
+            self.rate_limited += 1
+            self._wake.wait(self._attempt_times[0] + self.window - now)
+            self._wake.clear()
+        return False
+
+    def _run(self):
+        while True:
+            self._reconnect_loop()
+            with self._lock:
+                # A new drop may have been seen while this loop was finishing
+                if not self._active():
+                    self._thread = None
+                    return
+
+    def _reconnect_loop(self):
+        backoff = self.min_backoff
+        while self._wait_for_slot():
+            self.attempts += 1
+            try:
+                ok = self._reconnect()
+            except Exception as e:
+                log_event(f"Reconnect failed: {e}")
+                ok = False
+            if ok:
+                # The monitor confirms the link; _on_state_change ends the outage
+                self._monitor.kick()
+            else:
+                self.failures += 1
+            self._wake.wait(backoff * random.uniform(1.0, 1.5))
+            self._wake.clear()
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+
+        def pick(pct):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * pct / 100))]) if latencies else None
+
+        return {
+            'enabled': self.enabled,
+            'wanted': self.wanted,
+            'reconnecting': self._dropped_at is not None,
+            'drops': self.drops,
+            'attempts': self.attempts,
+            'failures': self.failures,
+            'rate_limited': self.rate_limited,
+            'restored': len(latencies),
+            'latency_ms': {
+                'last': round(self._latencies[-1]) if self._latencies else None,
+                'p50': pick(50),
+                'p90': pick(90),
+                'max': round(latencies[-1]) if latencies else None,
+            },
+            'watch_interval_s': self._monitor.max_interval,
+        }
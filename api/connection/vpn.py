@@ -1,27 +1,268 @@
+"""
+VPN backends for connecting from outside the university network (state 0).
+
+The L2TP/IPsec profile is created once and reused: a connect dials straight away and only builds the profile
+when the dial reports that it is missing (or, on Windows, broken). SHARIF_CONNECT_VPN_BACKEND picks the
+backend (windows, linux or fake); by default it follows the platform.
+"""
+import os
+import random
 import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+from api import metrics
+from api.configurations import log_event
 
 VPN_NAME = "sharif"
 VPN_SERVER = "access2.sharif.edu"
 PRE_SHARED_KEY = "access1.sharif.ir"
+COMMAND_TIMEOUT = 45  # seconds, per subprocess
 
-def connect_vpn(username, password):
-    try:
-        subprocess.run(["rasphone", "-R", VPN_NAME], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,creationflags=subprocess.CREATE_NO_WINDOW)
+# rasdial exits with the RAS error code
+RAS_ENTRY_NOT_FOUND = 623
+RAS_AUTH_FAILED = 691
+RAS_L2TP_SECURITY_FAILED = 789  # stale or damaged profile (e.g. a different PSK): rebuilt once
+# nmcli exit code for an unknown connection
+NM_NOT_FOUND = 10
+
+_CREATE_NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)  # Windows only
+
+
+def run_command(command, check=False):
+    """Run one hidden, time-limited command, recording how long it took."""
+    with metrics.timed("subprocess", command[0]):
+        return subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                              creationflags=_CREATE_NO_WINDOW, check=check, timeout=COMMAND_TIMEOUT)
+
+
+class VpnBackend:
+    """Connect and disconnect the VPN; keeps the timings of the last dials (profile work vs. the dial itself)."""
+
+    name = "base"
+
+    def __init__(self):
+        self._dials = deque(maxlen=50)
+
+    def connect(self, username, password):
+        timing = {'profile': 'reused', 'profile_ms': 0.0, 'dial_ms': 0.0}
+        started = time.perf_counter()
+        try:
+            success, message = self._connect(username, password, timing)
+        except subprocess.TimeoutExpired as e:
+            success, message = False, f"VPN timed out: {e.cmd[0]}"
+        except OSError as e:
+            success, message = False, f"VPN failed: {e}"
+        timing['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        timing['profile_ms'] = round(timing['profile_ms'], 1)
+        timing['dial_ms'] = round(timing['dial_ms'], 1)
+        self._dials.append({'time': time.time(), 'success': success, **timing})
+        metrics.record("vpn", f"{self.name} dial", timing['total_ms'], success=success, profile=timing['profile'])
+        log_event(f"VPN dial via {self.name}: {message}", **timing)
+        return success, message
+
+    def disconnect(self):
+        try:
+            return self._disconnect()
+        except subprocess.TimeoutExpired:
+            return False, "Timed out disconnecting VPN"
+        except OSError as e:
+            return False, f"Failed to disconnect VPN: {e}"
+
+    def _connect(self, username, password, timing):
+        raise NotImplementedError
+
+    def _disconnect(self):
+        raise NotImplementedError
 
-        subprocess.run([
-            "powershell", "-Command",
+    def _timed(self, timing, key, command):
+        started = time.perf_counter()
+        try:
+            return run_command(command).returncode
+        finally:
+            timing[key] += (time.perf_counter() - started) * 1000
+
+    def report(self):
+        """Return the backend name and the timings of the recent dials."""
+        dials = list(self._dials)
+        totals = sorted(d['total_ms'] for d in dials if d['success'])
+        return {
+            'backend': self.name,
+            'dials': len(dials),
+            'failures': sum(1 for d in dials if not d['success']),
+            'profile_builds': sum(1 for d in dials if d['profile'] != 'reused'),
+            'p50_ms': totals[len(totals) // 2] if totals else None,
+            'last': dials[-1] if dials else None,
+        }
+
+
+class WindowsVpnBackend(VpnBackend):
+    """rasdial against a persistent phonebook entry; PowerShell only runs when the entry has to be (re)built."""
+
+    name = "windows"
+
+    def _connect(self, username, password, timing):
+        code = self._dial(username, password, timing)
+        if code in (RAS_ENTRY_NOT_FOUND, RAS_L2TP_SECURITY_FAILED):
+            timing['profile'] = 'created' if code == RAS_ENTRY_NOT_FOUND else 'rebuilt'
+            if self._timed(timing, 'profile_ms', self._profile_command()) != 0:
+                return False, "Could not create the VPN profile"
+            code = self._dial(username, password, timing)
+        if code == 0:
+            return True, "VPN connected successfully."
+        if code == RAS_AUTH_FAILED:
+            return False, "VPN failed: username or password incorrect"
+        return False, f"VPN failed (error {code})"
+
+    def _dial(self, username, password, timing):
+        return self._timed(timing, 'dial_ms', ["rasdial", VPN_NAME, username, password])
+
+    def _profile_command(self):
+        return [
+            "powershell", "-NoProfile", "-NonInteractive", "-Command",
             f"Add-VpnConnection -Name '{VPN_NAME}' -ServerAddress '{VPN_SERVER}' -TunnelType L2tp "
             f"-L2tpPsk '{PRE_SHARED_KEY}' -AuthenticationMethod PAP -Force"
-        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,creationflags=subprocess.CREATE_NO_WINDOW, check=True)
+        ]
+
+    def _disconnect(self):
+        if run_command(["rasdial", VPN_NAME, "/disconnect"]).returncode != 0:
+            return False, "Failed to disconnect VPN"
+        return True, "VPN disconnected successfully."
+
+
+class LinuxVpnBackend(VpnBackend):
+    """NetworkManager connection of the l2tp plugin (which drives xl2tpd and the IPsec daemon), via nmcli.
+
+    The username lives in the profile, so it is updated when another user connects; the password goes in a
+    private passwd-file for each dial and is never stored by NetworkManager.
+    """
+
+    name = "linux"
 
-        subprocess.run(["rasdial", VPN_NAME, username, password], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,creationflags=subprocess.CREATE_NO_WINDOW, check=True)
+    def __init__(self):
+        super().__init__()
+        self._profile_user = None  # user the profile was last set up for by this process
+
+    def _vpn_data(self, username):
+        return (f"gateway={VPN_SERVER}, ipsec-enabled=yes, ipsec-psk={PRE_SHARED_KEY}, user={username}, "
+                f"password-flags=2, refuse-eap=yes, refuse-chap=yes, refuse-mschap=yes, refuse-mschapv2=yes")
+
+    def _create_profile(self, username, timing):
+        timing['profile'] = 'created'
+        return self._timed(timing, 'profile_ms', [
+            "nmcli", "connection", "add", "type", "vpn", "con-name", VPN_NAME, "vpn-type", "l2tp",
+            "autoconnect", "no", "vpn.data", self._vpn_data(username)])
+
+    def _connect(self, username, password, timing):
+        if self._profile_user != username:
+            timing['profile'] = 'updated'
+            code = self._timed(timing, 'profile_ms', [
+                "nmcli", "connection", "modify", VPN_NAME, "vpn.data", self._vpn_data(username)])
+            if code == NM_NOT_FOUND:
+                code = self._create_profile(username, timing)
+            if code != 0:
+                return False, "Could not create the VPN profile"
+            self._profile_user = username
+        code = self._dial(password, timing)
+        if code == NM_NOT_FOUND:  # deleted behind our back
+            if self._create_profile(username, timing) != 0:
+                return False, "Could not create the VPN profile"
+            code = self._dial(password, timing)
+        if code == 0:
+            return True, "VPN connected successfully."
+        return False, f"VPN failed (nmcli exit code {code})"
+
+    def _dial(self, password, timing):
+        fd, path = tempfile.mkstemp(prefix="sharif-vpn-")  # created 0600
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(f"vpn.secrets.password:{password}\n")
+            return self._timed(timing, 'dial_ms', ["nmcli", "connection", "up", "id", VPN_NAME, "passwd-file", path])
+        finally:
+            os.unlink(path)
+
+    def _disconnect(self):
+        if run_command(["nmcli", "connection", "down", "id", VPN_NAME]).returncode != 0:
+            return False, "Failed to disconnect VPN"
+        return True, "VPN disconnected successfully."
+
+
+class FakeVpnBackend(VpnBackend):
+    """Dial nothing: wait `latency` seconds (+-50%) and fail a `failure_rate` share of the dials.
+
+    For tests and benchmarks; the first dial also pays `profile_latency`, like building a real profile.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency=None, failure_rate=None, profile_latency=None):
+        super().__init__()
+        self.latency = float(os.getenv("SHARIF_CONNECT_FAKE_VPN_LATENCY", 0.2) if latency is None else latency)
+        self.failure_rate = float(os.getenv("SHARIF_CONNECT_FAKE_VPN_FAILURE_RATE", 0)
+                                  if failure_rate is None else failure_rate)
+        self.profile_latency = self.latency * 5 if profile_latency is None else profile_latency
+        self.connected = False
+        self._has_profile = False
+
+    def _sleep(self, timing, key, seconds):
+        started = time.perf_counter()
+        time.sleep(seconds)
+        timing[key] += (time.perf_counter() - started) * 1000
+
+    def _connect(self, username, password, timing):
+        if not self._has_profile:
+            timing['profile'] = 'created'
+            self._sleep(timing, 'profile_ms', self.profile_latency)
+            self._has_profile = True
+        self._sleep(timing, 'dial_ms', self.latency * random.uniform(0.5, 1.5))
+        if random.random() < self.failure_rate:
+            return False, "VPN failed (simulated)"
+        self.connected = True
         return True, "VPN connected successfully."
-    except subprocess.CalledProcessError as e:
-        return False, "VPN failed"
 
-def disconnect_vpn():
-    try:
-        subprocess.run(["rasdial", "/disconnect"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,creationflags=subprocess.CREATE_NO_WINDOW, check=True)
+    def _disconnect(self):
+        self.connected = False
         return True, "VPN disconnected successfully."
-    except subprocess.CalledProcessError as e:
-        return False, "Failed to disconnect VPN"
+
+
+BACKENDS = {
+    'windows': WindowsVpnBackend,
+    'linux': LinuxVpnBackend,
+    'fake': FakeVpnBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the process-wide VPN backend (SHARIF_CONNECT_VPN_BACKEND, else the one of this platform)."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            name = os.getenv("SHARIF_CONNECT_VPN_BACKEND", "").lower()
+            if name not in BACKENDS:
+                if name:
+                    log_event(f"Unknown VPN backend {name}, using the platform default")
+                name = 'windows' if sys.platform == 'win32' else 'linux'
+            _backend = BACKENDS[name]()
+        return _backend
+
+
+def set_backend(backend):
+    """Replace the process-wide backend (tests, benchmarks) and return it."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+    return backend
+
+
+def connect_vpn(username, password):
+    return get_backend().connect(username, password)
+
+
+def disconnect_vpn():
+    return get_backend().disconnect()
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from api.configurations import CONFIG_FILE, get_fernet, log_event
+
+COOKIE_FILE = CONFIG_FILE.with_name("cookies.enc")
+MAX_SESSION_COOKIE_AGE = 12 * 3600  # seconds to keep cookies that have no expiry of their own
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def fingerprint(username, password):
+    """Tie stored cookies to the credentials they were issued for, without storing the password."""
+    return hashlib.sha256(f"{username}\0{password}".encode()).hexdigest()
+
+
+class CookieStore:
+    """Fernet-encrypted file of the portal cookies of each user, so a restart can skip the login handshakes.
+
+    Cookies are restored without a round trip; a pool finds out they are stale on first use (SessionExpired)
+    and logs in again.
+    """
+
+    def __init__(self, path=COOKIE_FILE):
+        self.path = path
+        self._data = None  # {portal: {username: {'fingerprint', 'saved', 'cookies': [...]}}}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read and decrypt the file (once); unreadable files count as empty."""
+        with self._lock:
+            if self._data is None:
+                self._data = self._read()
+            return self._data
+
+    def _read(self):
+        if not self.path.exists():
+            return {}
+        try:
+            return json.loads(get_fernet().decrypt(self.path.read_bytes()))
+        except Exception as e:
+            log_event(f"Error loading cookies: {e}")
+            return {}
+
+    def _write(self):
+        # Called with self._lock held
+        temp = self.path.with_suffix(".tmp")
+        temp.write_bytes(get_fernet().encrypt(json.dumps(self._data).encode()))
+        os.replace(temp, self.path)
+
+    def restore(self, portal, username, password, session):
+        """Put the unexpired stored cookies of the user into session; return how many were restored."""
+        now = time.time()
+        with self._lock:
+            if self._data is None:
+                self._data = self._read()
+            entry = self._data.get(portal, {}).get(username)
+        if not entry or entry['fingerprint'] != fingerprint(username, password):
+            return 0
+        restored = 0
+        for cookie in entry['cookies']:
+            expires = cookie['expires'] or entry['saved'] + MAX_SESSION_COOKIE_AGE
+            if expires <= now:
+                continue
+            session.cookies.set(cookie['name'], cookie['value'], domain=cookie['domain'], path=cookie['path'],
+                                expires=cookie['expires'], secure=cookie['secure'])
+            restored += 1
+        return restored
+
+    def save(self, portal, username, password, session):
+        """Store the cookies of an authenticated session."""
+        now = time.time()
+        cookies = [
+            {'name': c.name, 'value': c.value, 'domain': c.domain, 'path': c.path, 'expires': c.expires,
+             'secure': c.secure}
+            for c in session.cookies if c.expires is None or c.expires > now
+        ]
+        with self._lock:
+            if self._data is None:
+                self._data = self._read()
+            self._data.setdefault(portal, {})[username] = {
+                'fingerprint': fingerprint(username, password),
+                'saved': now,
+                'cookies': cookies,
+            }
+            try:
+                self._write()
+            except OSError as e:
+                log_event(f"Error saving cookies: {e}")
+
+    def forget(self, username=None, portal=None):
+        """Drop the stored cookies of one user (or everyone), on one portal (or all of them)."""
+        with self._lock:
+            if self._data is None:
+                self._data = self._read()
+            changed = False
+            for name, users in self._data.items():
+                if portal is not None and name != portal:
+                    continue
+                if username is None:
+                    changed = changed or bool(users)
+                    users.clear()
+                else:
+                    changed = users.pop(username, None) is not None or changed
+            if not changed:
+                return
+            try:
+                self._write()
+            except OSError as e:
+                log_event(f"Error saving cookies: {e}")
+
+
+def get_cookie_store():
+    """Return the process-wide cookie store (the file is read on first use)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CookieStore()
+        return _store
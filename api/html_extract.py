@@ -0,0 +1,138 @@
+"""
+Single-pass extraction of the few things we need from the portal pages.
+
+Callers name the input fields or the table they want; the page is tokenized once (no tree is built)
+and parsing stops as soon as everything asked for has been seen.
+"""
+import codecs
+from html.parser import HTMLParser
+
+
+class _Enough(Exception):
+    pass
+
+
+class InputValuesParser(HTMLParser):
+    """Collect the value attribute of the <input> elements with the given names (first one of each name)."""
+
+    def __init__(self, names):
+        super().__init__(convert_charrefs=True)
+        self.wanted = set(names)
+        self.values = {}
+
+    def handle_starttag(self, tag, attrs):
+        if tag != "input":
+            return
+        attrs = dict(attrs)
+        name = attrs.get("name")
+        if name in self.wanted and name not in self.values:
+            self.values[name] = attrs.get("value") or ""
+            if len(self.values) == len(self.wanted):
+                raise _Enough()
+
+    handle_startendtag = handle_starttag
+
+    def feed_stream(self, chunks):
+        """Feed text chunks until every wanted input is found; return {name: value} of those found."""
+        try:
+            for chunk in chunks:
+                self.feed(chunk)
+            self.close()
+        except _Enough:
+            pass
+        return self.values
+
+
+class TableRowsParser(HTMLParser):
+    """Collect the cell texts of the <tbody> rows of one table.
+
+    Parsing stops once `stop_after` rows are read, or at the first row for which `stop_when(cells)` is true
+    (that row is not kept).
+    """
+
+    def __init__(self, table_id, stop_after=None, stop_when=None):
+        super().__init__(convert_charrefs=True)
+        self.table_id = table_id
+        self.stop_after = stop_after
+        self.stop_when = stop_when
+        self.rows = []
+        self.found_table = False
+        self._depth = 0  # nesting level of <table> inside the wanted table
+        self._in_body = False
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if self._depth == 0:
+            if tag == "table" and dict(attrs).get("id") == self.table_id:
+                self.found_table = True
+                self._depth = 1
+            return
+        if tag == "table":
+            self._depth += 1
+        elif self._depth == 1:
+            if tag == "tbody":
+                self._in_body = True
+            elif tag == "tr" and self._in_body:
+                self._row = []
+            elif tag == "td" and self._row is not None:
+                self._cell = []
+
+    def handle_endtag(self, tag):
+        if self._depth == 0:
+            return
+        if tag == "table":
+            self._depth -= 1
+            if self._depth == 0:
+                raise _Enough()
+        elif self._depth == 1:
+            if tag == "td" and self._cell is not None:
+                self._row.append(" ".join("".join(self._cell).split()))
+                self._cell = None
+            elif tag == "tr" and self._row is not None:
+                if self.stop_when is not None and self.stop_when(self._row):
+                    raise _Enough()
+                self.rows.append(self._row)
+                self._row = None
+                if self.stop_after is not None and len(self.rows) >= self.stop_after:
+                    raise _Enough()
+            elif tag == "tbody":
+                self._in_body = False
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+    def feed_stream(self, chunks):
+        """Feed text chunks until the table (or the wanted number of rows) is complete."""
+        try:
+            for chunk in chunks:
+                self.feed(chunk)
+        except _Enough:
+            return self.rows
+        self.close()
+        return self.rows
+
+
+def iter_text(response, chunk_size=16 * 1024):
+    """Decode a streamed response into text chunks."""
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+def _chunks(page):
+    return [page] if isinstance(page, str) else page
+
+
+def extract_inputs(page, names):
+    """Return {name: value} for the named <input> fields of a page (text or text chunks); missing names are left out."""
+    return InputValuesParser(names).feed_stream(_chunks(page))
+
+
+def extract_table(page, table_id, stop_after=None, stop_when=None):
+    """Return (found, rows) for the <tbody> rows of the table with the given id, each row a list of cell texts."""
+    parser = TableRowsParser(table_id, stop_after=stop_after, stop_when=stop_when)
+    rows = parser.feed_stream(_chunks(page))
+    return parser.found_table, rows
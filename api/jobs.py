@@ -0,0 +1,188 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api.configurations import log_event
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once the user has cancelled it."""
+
+
+class StepTimeout(Exception):
+    """Raised inside a job when a step runs past its deadline."""
+
+
+class Job:
+    """A slow bridge call running on the worker pool, with progress events and cooperative cancellation."""
+
+    def __init__(self, job_id, name, key=None, on_event=None):
+        self.id = job_id
+        self.name = name
+        self.key = key
+        self.status = 'pending'  # pending, running, done, failed, cancelled
+        self.result = None
+        self.error = None
+        self.events = []
+        self.created = time.time()
+        self._on_event = on_event
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        self._steps = []  # step threads; one can outlive its step when the step times out or is cancelled
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def check(self):
+        if self.cancelled:
+            raise JobCancelled(self.name)
+
+    def progress(self, step, message=''):
+        """Record that the job entered a new step and push it to the UI."""
+        self.check()
+        event = {'job_id': self.id, 'seq': len(self.events) + 1, 'step': step, 'message': message,
+                 'time': round(time.time() - self.created, 3)}
+        self.events.append(event)
+        if self._on_event:
+            self._on_event(event)
+
+    def run_step(self, step, fn, deadline, message=''):
+        """Run fn() as the given step, giving up after `deadline` seconds or when the job is cancelled."""
+        self.progress(step, message)
+        outcome = {}
+
+        def target():
+            try:
+                outcome['result'] = fn()
+            except BaseException as e:
+                outcome['error'] = e
+
+        worker = threading.Thread(target=target, name=f"{self.name}-{step}", daemon=True)
+        self._steps.append(worker)
+        worker.start()
+        ends = time.monotonic() + deadline
+        while worker.is_alive():
+            self.check()
+            remaining = ends - time.monotonic()
+            if remaining <= 0:
+                raise StepTimeout(f"{step} took longer than {deadline}s")
+            worker.join(min(remaining, 0.1))
+        self.check()
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['result']
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        return self.result
+
+    @property
+    def lingering(self):
+        """True while a step thread the job gave up on (timeout, cancel) is still running."""
+        return any(worker.is_alive() for worker in self._steps)
+
+    def settle(self):
+        """Wait until the job is over and none of its step threads is running any more."""
+        self._done.wait()
+        for worker in self._steps:
+            worker.join()
+
+    def snapshot(self, since=0):
+        return {
+            'job_id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'events': self.events[since:],
+        }
+
+
+class JobManager:
+    """Run slow operations on a bounded pool; identical requests join the job already in flight.
+
+    A key stays taken until the job's step threads have really finished: a job submitted while an earlier one
+    with the same key is over but still has a step running (e.g. a dial past its deadline) waits for it first,
+    so the same operation never runs twice side by side.
+    """
+
+    def __init__(self, max_workers=4, on_event=None, keep=50):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._on_event = on_event
+        self._keep = keep
+        self._ids = itertools.count(1)
+        self._jobs = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, name, fn, key=None):
+        """Start fn(job) in the background and return the job; reuse the in-flight job with the same key."""
+        key = key if key is not None else name
+        with self._lock:
+            previous = self._inflight.get(key)
+            if previous is not None and not previous._done.is_set():
+                return previous
+            job = Job(str(next(self._ids)), name, key, self._on_event)
+            self._jobs[job.id] = job
+            self._inflight[key] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn, previous)
+        return job
+
+    def inflight(self, key):
+        """Return the job holding the key (running, or over with a step still running), or None."""
+        with self._lock:
+            return self._inflight.get(key)
+
+    def _run(self, job, fn, previous=None):
+        job.status = 'running'
+        try:
+            if previous is not None and previous.lingering:
+                job.progress('waiting', f'{previous.name} is still finishing')
+                previous.settle()
+            job.result = fn(job)
+            job.status = 'done'
+        except JobCancelled:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            log_event(f"Job {job.name} failed: {e}")
+        finally:
+            job._done.set()
+            if self._on_event:
+                self._on_event({'job_id': job.id, 'seq': len(job.events) + 1, 'step': job.status,
+                                'message': job.error or '', 'time': round(time.time() - job.created, 3)})
+            if job.lingering:
+                # Keep the key until the abandoned step is over; the next job with it waits for that
+                threading.Thread(target=self._release, args=(job,), name=f"{job.name}-release", daemon=True).start()
+            else:
+                self._release(job)
+
+    def _release(self, job):
+        job.settle()
+        with self._lock:
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+
+    def _prune(self):
+        # Called with self._lock held: forget the oldest finished jobs.
+        finished = [j for j in self._jobs.values() if j._done.is_set()]
+        for job in finished[:max(0, len(self._jobs) - self._keep)]:
+            del self._jobs[job.id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        return True
@@ -1,42 +1,99 @@
-import requests
-from bs4 import BeautifulSoup
+import re
+
+from api import metrics
+from api.cookie_store import get_cookie_store
+from api.html_extract import extract_inputs, extract_table, iter_text
+from api.session_pool import SessionExpired, SessionPool
+from api.transport import TIMEOUTS, new_session
 
 BW_LOGIN_URL ="https://bw.ictc.sharif.edu/login"
 BW_LOGS_URL = "https://bw.ictc.sharif.edu/connections"
 
-def get_bandwidth_logs(username ,password):
-    session = requests.Session()
-    session.get(BW_LOGIN_URL)
+SIZE_UNITS = {
+    "b": 1, "byte": 1, "bytes": 1,
+    "kb": 1024, "k": 1024, "kib": 1024,
+    "mb": 1024 ** 2, "m": 1024 ** 2, "mib": 1024 ** 2,
+    "gb": 1024 ** 3, "g": 1024 ** 3, "gib": 1024 ** 3,
+    "tb": 1024 ** 4, "t": 1024 ** 4, "tib": 1024 ** 4,
+}
+_SIZE_RE = re.compile(r"([0-9]+(?:[.,][0-9]+)*)\s*([a-zA-Z]*)")
+_GROUPED_RE = re.compile(r"[0-9]{1,3}(?:,[0-9]{3})+(?:\.[0-9]+)?")  # 1,024 / 1,234,567.5
+_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+
+
+def parse_size(text):
+    """Convert an upload/download string such as '12.5 MB' into bytes (None if it can't be read)."""
+    match = _SIZE_RE.search(text.translate(_DIGITS))
+    if not match:
+        return None
+    number = match.group(1)
+    # A ',' followed by exactly three digits groups thousands ('1,024', '1,024.5'); otherwise ('12,5') it is
+    # the decimal point
+    if _GROUPED_RE.fullmatch(number):
+        number = number.replace(",", "")
+    elif "," in number:
+        if number.count(",") > 1 or "." in number:
+            return None
+        number = number.replace(",", ".")
+    unit = SIZE_UNITS.get(match.group(2).lower() or "b")
+    if unit is None:
+        return None
+    return int(float(number) * unit)
+
+
+def to_log(cols):
+    return {
+        "index": cols[0],
+        "login_time": cols[1],
+        "logout_time": cols[2],
+        "upload": cols[3],
+        "download": cols[4],
+        "upload_bytes": parse_size(cols[3]),
+        "download_bytes": parse_size(cols[4]),
+    }
+
+
+def bw_login(username, password):
+    session = new_session()
+    session.get(BW_LOGIN_URL, timeout=TIMEOUTS['auth'])
     headers = {
         "Referer": BW_LOGIN_URL,
         "Content-Type": "application/x-www-form-urlencoded",
 
     }
     data = f"normal_username={username}&normal_password={password}"
-    session.post(BW_LOGIN_URL, data=data,headers=headers,allow_redirects=True)
-    response=session.get(BW_LOGS_URL)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    try:
-        table = soup.find("table", id="csvtable")
-        rows = table.find("tbody").find_all("tr")
-        logs = []
-
-        for row in rows[:30]:
-            cols = row.find_all("td")
-            if len(cols) < 5:
-                continue
-            logs.append({
-                "index": cols[0].get_text(strip=True),
-                "login_time": cols[1].get_text(strip=True),
-                "logout_time": cols[2].get_text(strip=True),
-                "upload": cols[3].get_text(strip=True),
-                "download": cols[4].get_text(strip=True),
-            })
+    res = session.post(BW_LOGIN_URL, data=data,headers=headers,allow_redirects=True, timeout=TIMEOUTS['auth'])
+    # A refused login stays on the login page with its form instead of redirecting into the site
+    if res.status_code != 200 or 'normal_password' in extract_inputs(res.text, ['normal_password']):
+        return False, "Username or password incorrect", None
+    return True, "Login successful", session
+
+
+bw_pool = SessionPool("bw.ictc.sharif.edu", bw_login, get_cookie_store())
 
-        return True, logs
-    except Exception as e:
-        return False, {"error": str(e)}
 
+def fetch_bandwidth_logs(session, offset=0, limit=30, until=None):
+    with session.get(BW_LOGS_URL, stream=True, timeout=TIMEOUTS['stream']) as response:
+        if response.url.startswith(BW_LOGIN_URL):
+            raise SessionExpired(response.url)
+        stop_when = None
+        if until is not None:
+            stop_when = lambda cols: len(cols) >= 5 and until(to_log(cols))
+        with metrics.timed("parse", "connections table"):
+            found, rows = extract_table(iter_text(response), "csvtable",
+                                        stop_after=None if limit is None else offset + limit, stop_when=stop_when)
+    if not found:
+        raise ValueError("csvtable not found in connections page")
+    return [to_log(cols) for cols in rows[offset:] if len(cols) >= 5]
 
 
+def get_bandwidth_logs(username ,password, offset=0, limit=30, until=None):
+    """Return (True, logs) for rows offset..offset+limit of the connections table (limit=None: all rows).
 
+    `until(log)` can end the read early, e.g. at the first row that is already stored locally.
+    """
+    try:
+        logs = bw_pool.run(username, password, lambda session: fetch_bandwidth_logs(session, offset, limit, until))
+        return True, logs
+    except Exception as e:
+        return False, {"error": str(e)}
@@ -1,43 +1,74 @@
 import requests
-from bs4 import BeautifulSoup
+
+from api import metrics
+from api.cookie_store import get_cookie_store
+from api.html_extract import extract_inputs
+from api.session_pool import LoginError, SessionExpired, SessionPool
+from api.transport import TIMEOUTS, new_session
+
 LOGIN_URL = "https://accounts.sharif.edu/cas/login"
 USER_URL = "https://register.sharif.edu/profile"
 
-def get_data(username, password):
-    session = requests.Session()
+# Profile key -> name of the <input> holding it on the register.sharif.edu profile page
+PROFILE_FIELDS = {
+    "fullname": "cn",
+    "fullname_en": "cn;lang-en-US",
+    "national_id": "nationalid",
+    "gender": "gender",
+    "father_name": "fathername",
+    "postal_address": "postaladdress",
+    "postalcode": "postalcode",
+    "account_status": "accountstatus",
+    "telephone_number": "telephonenumber",
+    "mobile": "mobile",
+    "dc_submail_address": "dcsubmailaddress",
+    "param": "param",
+}
+
+def cas_login(username, password):
+    session = new_session()
 
-    res = session.get(LOGIN_URL)
+    res = session.get(LOGIN_URL, timeout=TIMEOUTS['auth'])
     if res.status_code != requests.codes.ok:
-        return False, {}
-    soup = BeautifulSoup(res.text, 'html.parser')
-    execution = soup.find('input', attrs={'name': 'execution'})
-    if not execution:
-        return False, {}
+        return False, "Failed to load CAS login page", None
+    with metrics.timed('parse', 'cas login form'):
+        execution = extract_inputs(res.text, ['execution']).get('execution')
+    if execution is None:
+        return False, "CAS execution token not found in login form", None
     data = {
         'username': username,
         'password': password,
-        'execution': execution['value'],
+        'execution': execution,
         '_eventId': 'submit',
         'geolocation': ''
     }
-    session.post(LOGIN_URL, data=data,allow_redirects=True)
-    session.get(url=f"{LOGIN_URL}?service=https://register.sharif.edu/profile",allow_redirects=True)
-    response =  session.get(USER_URL)
-    if response.status_code != requests.codes.ok or "ورود" in response.text:
+    res = session.post(LOGIN_URL, data=data,allow_redirects=True, timeout=TIMEOUTS['auth'])
+    # A refused login answers with the form again (HTTP 401 from the CAS) instead of the logged-in page
+    if res.status_code == 401 or 'execution' in extract_inputs(res.text, ['execution']):
+        return False, "Username or password incorrect", None
+    session.get(url=f"{LOGIN_URL}?service=https://register.sharif.edu/profile",allow_redirects=True,
+                timeout=TIMEOUTS['auth'])
+    return True, "Login successful", session
+
+
+cas_pool = SessionPool("accounts.sharif.edu", cas_login, get_cookie_store())
+
+
+def fetch_profile(session):
+    response = session.get(USER_URL, timeout=TIMEOUTS['page'])
+    if response.status_code != requests.codes.ok:
         return False, {}
-    soup = BeautifulSoup(response.text, 'html.parser')
-    return  True , {
-        "fullname": soup.find('input', attrs={'name': 'cn'})['value'],
-        "fullname_en": soup.find('input', attrs={'name': 'cn;lang-en-US'})['value'],
-        "national_id" : soup.find('input', attrs={'name': 'nationalid'})['value'],
-        "gender": soup.find('input', attrs={'name': 'gender'})['value'],
-        "father_name": soup.find('input', attrs={'name': 'fathername'})['value'],
-        "postal_address" : soup.find('input', attrs={'name': 'postaladdress'})['value'],
-        "postalcode" : soup.find('input', attrs={'name': 'postalcode'})['value'],
-        "account_status" : soup.find('input', attrs={'name': 'accountstatus'})['value'],
-        "telephone_number" : soup.find('input', attrs={'name': 'telephonenumber'})['value'],
-        "mobile": soup.find('input', attrs={'name': 'mobile'})['value'],
-        "dc_submail_address" : soup.find('input', attrs={'name': 'dcsubmailaddress'})['value'],
-        "param": soup.find('input', attrs={'name': 'param'})['value'],
-    }
+    if "ورود" in response.text:
+        raise SessionExpired(response.url)
+    with metrics.timed('parse', 'profile page'):
+        values = extract_inputs(response.text, PROFILE_FIELDS.values())
+    if PROFILE_FIELDS["fullname"] not in values:
+        return False, {}
+    return True, {key: values.get(name, "") for key, name in PROFILE_FIELDS.items()}
 
+
+def get_data(username, password):
+    try:
+        return cas_pool.run(username, password, fetch_profile)
+    except (LoginError, SessionExpired):
+        return False, {}
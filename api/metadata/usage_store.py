@@ -0,0 +1,177 @@
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from api.configurations import CONFIG_FILE
+
+USAGE_DB = CONFIG_FILE.with_name("usage.sqlite3")
+# Y-M-D or Y/M/D, optionally followed by H:M or H:M:S
+_TIME_RE = re.compile(r"(\d{4})[-/](\d{1,2})[-/](\d{1,2})(?: (\d{1,2}):(\d{1,2})(?::(\d{1,2}))?)?")
+_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+
+
+def jalali_to_gregorian(jy, jm, jd):
+    """Convert a Jalali (Solar Hijri) date to a Gregorian date."""
+    jy += 1595
+    days = -355668 + 365 * jy + (jy // 33) * 8 + ((jy % 33) + 3) // 4 + jd
+    days += (jm - 1) * 31 if jm < 7 else (jm - 7) * 30 + 186
+    gy = 400 * (days // 146097)
+    days %= 146097
+    if days > 36524:
+        days -= 1
+        gy += 100 * (days // 36524)
+        days %= 36524
+        if days >= 365:
+            days += 1
+    gy += 4 * (days // 1461)
+    days %= 1461
+    if days > 365:
+        gy += (days - 1) // 365
+        days = (days - 1) % 365
+    leap = (gy % 4 == 0 and gy % 100 != 0) or gy % 400 == 0
+    month_days = [31, 29 if leap else 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    gd = days + 1
+    gm = 0
+    while gm < 12 and gd > month_days[gm]:
+        gd -= month_days[gm]
+        gm += 1
+    return gy, gm + 1, gd
+
+
+def parse_time(text):
+    """Turn a login/logout time string from the ICTC site into a local epoch (None if unknown)."""
+    match = _TIME_RE.fullmatch(" ".join(text.translate(_DIGITS).split()))
+    if not match:
+        return None
+    year, month, day, hour, minute, second = (int(part or 0) for part in match.groups())
+    if year < 1700:  # Jalali calendar: months 1-6 have 31 days, so convert before datetime validates the day
+        if not (1 <= month <= 12 and 1 <= day <= (31 if month <= 6 else 30)):
+            return None
+        gregorian = jalali_to_gregorian(year, month, day)
+        # 30 Esfand exists only in leap years; otherwise the conversion rolls it over to 1 Farvardin
+        if month == 12 and day == 30 and gregorian == jalali_to_gregorian(year + 1, 1, 1):
+            return None
+        year, month, day = gregorian
+    try:
+        return int(datetime(year, month, day, hour, minute, second).timestamp())
+    except ValueError:
+        return None
+
+
+class UsageStore:
+    """Append-only local copy of the bandwidth connection history, answering usage totals without the network."""
+
+    def __init__(self, path=USAGE_DB):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS usage ("
+                " username TEXT NOT NULL,"
+                " login_ts INTEGER NOT NULL,"
+                " login_time TEXT NOT NULL,"
+                " logout_time TEXT,"
+                " upload INTEGER NOT NULL DEFAULT 0,"
+                " download INTEGER NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (username, login_ts, login_time))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sync ("
+                " username TEXT PRIMARY KEY,"
+                " synced_at INTEGER NOT NULL)"
+            )
+
+    def last_login_ts(self, username):
+        """Login time of the newest stored row (rows at or before it are already synced)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(login_ts) FROM usage WHERE username = ?", (username,)).fetchone()
+        return row[0]
+
+    def last_synced_at(self, username):
+        with self._lock:
+            row = self._conn.execute("SELECT synced_at FROM sync WHERE username = ?", (username,)).fetchone()
+        return row[0] if row else None
+
+    def known_rows(self, username):
+        """Return a predicate telling whether a log row is already stored (used to stop reading early).
+
+        Nothing counts as known before the first complete sync, so the whole history gets read once.
+        The newest stored row is read again because its session may still be growing.
+        """
+        last = self.last_login_ts(username) if self.last_synced_at(username) is not None else None
+
+        def known(log):
+            ts = parse_time(log["login_time"])
+            return last is not None and ts is not None and ts < last
+        return known
+
+    def add(self, username, logs, complete=False):
+        """Store rows newer than the last synced login time; return how many were added or updated.
+
+        The newest stored row is replaced, since its upload/download may have grown since.
+        `complete` marks a read that went back to the last stored row, which updates the sync time.
+        """
+        last = self.last_login_ts(username) if self.last_synced_at(username) is not None else None
+        rows = []
+        for log in logs:
+            ts = parse_time(log["login_time"])
+            if ts is None or (last is not None and ts < last):
+                continue
+            rows.append((username, ts, log["login_time"], log["logout_time"],
+                         log.get("upload_bytes") or 0, log.get("download_bytes") or 0))
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO usage VALUES (?, ?, ?, ?, ?, ?)", rows)
+            if complete:
+                self._conn.execute("INSERT OR REPLACE INTO sync VALUES (?, ?)", (username, int(time.time())))
+        return len(rows)
+
+    def totals(self, username, since_ts, until_ts=None):
+        """Return (upload, download) bytes of sessions that started in [since_ts, until_ts)."""
+        until_ts = until_ts if until_ts is not None else 2 ** 62
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(upload), 0), COALESCE(SUM(download), 0) FROM usage"
+                " WHERE username = ? AND login_ts >= ? AND login_ts < ?",
+                (username, since_ts, until_ts)).fetchone()
+        return row[0], row[1]
+
+    def daily(self, username, days=30):
+        """Per-day upload/download for the last `days` days, oldest first."""
+        since = datetime.combine(date.today() - timedelta(days=days - 1), datetime.min.time())
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT date(login_ts, 'unixepoch', 'localtime') AS day, SUM(upload), SUM(download) FROM usage"
+                " WHERE username = ? AND login_ts >= ? GROUP BY day ORDER BY day",
+                (username, int(since.timestamp()))).fetchall()
+        return [{'date': day, 'upload': up, 'download': down} for day, up, down in rows]
+
+    def summary(self, username, today=None):
+        """Upload/download totals for today, the last 7 days and the current month."""
+        today = today or date.today()
+        starts = {
+            'today': today,
+            'week': today - timedelta(days=6),
+            'month': today.replace(day=1),
+        }
+        result = {}
+        for name, start in starts.items():
+            upload, download = self.totals(username, int(datetime.combine(start, datetime.min.time()).timestamp()))
+            result[name] = {'upload': upload, 'download': download, 'total': upload + download}
+        result['synced_at'] = self.last_synced_at(username)
+        return result
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_usage_store():
+    """Return the process-wide usage store, opening the database on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = UsageStore()
+        return _store
@@ -0,0 +1,186 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from urllib.parse import urlsplit
+
+# Off unless SHARIF_CONNECT_METRICS=1 or the diagnostics page turns it on; when off every hook returns at once
+_enabled = os.getenv("SHARIF_CONNECT_METRICS", "").lower() in ("1", "true", "yes")
+_lock = threading.Lock()
+_events = deque(maxlen=500)
+_histograms = {}
+
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def is_enabled():
+    return _enabled
+
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+    return _enabled
+
+
+def record(kind, name, duration_ms, **fields):
+    """Add one timed event (kind: http, probe, subprocess, parse, vpn) to the ring buffer and its histogram.
+
+    Returns the event (None when off), for fields only known later (see http_hook).
+    """
+    if not _enabled:
+        return None
+    duration_ms = round(duration_ms, 2)
+    event = {'time': time.time(), 'kind': kind, 'name': name, 'ms': duration_ms, **fields}
+    key = f"{kind}:{name}"
+    with _lock:
+        _events.append(event)
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                            'buckets': [0] * (len(BUCKETS_MS) + 1)}
+        histogram['count'] += 1
+        histogram['total_ms'] += duration_ms
+        histogram['max_ms'] = max(histogram['max_ms'], duration_ms)
+        histogram['buckets'][_bucket(duration_ms)] += 1
+    return event
+
+
+def _bucket(duration_ms):
+    for index, bound in enumerate(BUCKETS_MS):
+        if duration_ms <= bound:
+            return index
+    return len(BUCKETS_MS)
+
+
+class _Timer:
+    __slots__ = ('kind', 'name', 'fields', 'started')
+
+    def __init__(self, kind, name, fields):
+        self.kind = kind
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.fields['error'] = exc_type.__name__
+        record(self.kind, self.name, (time.perf_counter() - self.started) * 1000, **self.fields)
+        return False
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_TIMER = _NoTimer()
+
+
+def timed(kind, name, **fields):
+    """Context manager that records how long its block took."""
+    if not _enabled:
+        return _NO_TIMER
+    return _Timer(kind, name, fields)
+
+
+def http_hook(response, *args, **kwargs):
+    """requests response hook: record URL, status, bytes and latency of every request (redirects included).
+
+    Without a Content-Length (chunked pages), the body bytes are counted as requests reads them: right away for
+    normal requests, which requests reads right after its hooks anyway, and as the caller iterates a stream=True
+    one. They stay None for a streamed body nobody reads.
+    """
+    if not _enabled:
+        return
+    url = urlsplit(response.url)
+    size = response.headers.get('Content-Length')
+    event = record('http', f"{response.request.method} {url.netloc}{url.path}",
+                   response.elapsed.total_seconds() * 1000, status=response.status_code,
+                   bytes=int(size) if size and size.isdigit() else None)
+    if event is None or event['bytes'] is not None:
+        return
+    if not kwargs.get('stream'):
+        _set_bytes(event, len(response.content))
+        return
+    iter_content = response.iter_content
+
+    def counting_iter_content(*args, **kwargs):
+        read = 0
+        try:
+            for chunk in iter_content(*args, **kwargs):
+                read += len(chunk)
+                yield chunk
+        finally:
+            # Also when the caller stops early (e.g. a parser that has found its rows)
+            _set_bytes(event, read)
+
+    # .content and iter_lines go through iter_content too
+    response.iter_content = counting_iter_content
+
+
+def _set_bytes(event, size):
+    with _lock:
+        event['bytes'] = size
+
+
+def instrument(session):
+    """Attach the metrics hook to a requests session and return it."""
+    session.hooks['response'].append(http_hook)
+    return session
+
+
+def _percentile(histogram, pct):
+    # Upper bound of the bucket holding the pct-th event (the max for the overflow bucket)
+    target = histogram['count'] * pct / 100
+    seen = 0
+    for index, count in enumerate(histogram['buckets']):
+        seen += count
+        if count and seen >= target:
+            return BUCKETS_MS[index] if index < len(BUCKETS_MS) else histogram['max_ms']
+    return None
+
+
+def snapshot(since=0.0, limit=200):
+    """Return the histograms and the newest events recorded after `since` (a unix time)."""
+    with _lock:
+        events = [e for e in _events if e['time'] > since][-limit:]
+        histograms = {
+            key: {
+                'count': h['count'],
+                'mean_ms': round(h['total_ms'] / h['count'], 2),
+                'max_ms': h['max_ms'],
+                'p50_ms': _percentile(h, 50),
+                'p90_ms': _percentile(h, 90),
+                'p99_ms': _percentile(h, 99),
+                'buckets': dict(zip([str(b) for b in BUCKETS_MS] + ['inf'], h['buckets'])),
+            }
+            for key, h in sorted(_histograms.items())
+        }
+    return {'enabled': _enabled, 'buckets_ms': BUCKETS_MS, 'histograms': histograms, 'events': events}
+
+
+def reset():
+    with _lock:
+        _events.clear()
+        _histograms.clear()
+
+
+def export_json(path=None):
+    """Write the current snapshot to a JSON file (by default in the logs folder) and return its path."""
+    if path is None:
+        from api.configurations import LOGS_DIR
+        path = LOGS_DIR / f"metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot(limit=_events.maxlen), f, ensure_ascii=False, indent=2)
+    return str(path)
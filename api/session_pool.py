@@ -0,0 +1,134 @@
+import threading
+from collections import OrderedDict
+
+from api.configurations import log_event
+
+
+class SessionExpired(Exception):
+    """Raised when a portal answers a pooled session with its login page."""
+
+
+class LoginError(Exception):
+    """Raised when the portal refuses to log the user in."""
+
+
+class SessionPool:
+    """Keep one authenticated requests session per user and log in again only when it expires.
+
+    With a cookie store, the cookies of each login are saved and a later process starts from them instead of
+    logging in; they are only checked when the first request with them comes back as SessionExpired.
+    With max_sessions, the least recently used sessions are dropped past that many users.
+    """
+
+    def __init__(self, name, login, cookie_store=None, max_sessions=None):
+        # login(username, password) -> (bool, message, session)
+        self.name = name
+        self.cookie_store = cookie_store
+        self.max_sessions = max_sessions
+        self._login = login
+        self._sessions = OrderedDict()
+        self._user_locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.relogins = 0
+        self.restored = 0
+        self.evicted = 0
+
+    def _user_lock(self, username):
+        with self._lock:
+            return self._user_locks.setdefault(username, threading.Lock())
+
+    def _store(self, username, password, session):
+        # Called with self._lock held
+        self._sessions[username] = (password, session)
+        self._sessions.move_to_end(username)
+        while self.max_sessions is not None and len(self._sessions) > self.max_sessions:
+            # Only dropped: the sessions share the transport's connection pools, closing one would close those
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    def _authenticate(self, username, password):
+        result, message, session = self._login(username, password)
+        if result is False:
+            raise LoginError(message)
+        with self._lock:
+            self._store(username, password, session)
+        if self.cookie_store is not None:
+            self.cookie_store.save(self.name, username, password, session)
+        return session
+
+    def _restore(self, username, password):
+        if self.cookie_store is None:
+            return None
+        from api.transport import new_session
+
+        session = new_session()
+        if not self.cookie_store.restore(self.name, username, password, session):
+            return None
+        with self._lock:
+            self._store(username, password, session)
+            self.restored += 1
+        return session
+
+    def get(self, username, password):
+        """Return the cached session of the user, logging in on the first call."""
+        with self._user_lock(username):
+            with self._lock:
+                entry = self._sessions.get(username)
+                if entry and entry[0] == password:
+                    self.hits += 1
+                    self._sessions.move_to_end(username)
+                    return entry[1]
+                self.misses += 1
+            return self._restore(username, password) or self._authenticate(username, password)
+
+    def peek(self, username):
+        """Return the cached session of the user without logging in (None if there is none)."""
+        with self._lock:
+            entry = self._sessions.get(username)
+        return entry[1] if entry else None
+
+    def relogin(self, username, password, expired=None):
+        """Replace an expired session with a freshly authenticated one."""
+        with self._user_lock(username):
+            with self._lock:
+                entry = self._sessions.get(username)
+                # Another caller already replaced the expired session while we waited.
+                if entry and expired is not None and entry[1] is not expired and entry[0] == password:
+                    self.hits += 1
+                    return entry[1]
+                self.relogins += 1
+            log_event(f"{self.name}: session of {username} expired, logging in again")
+            return self._authenticate(username, password)
+
+    def run(self, username, password, action):
+        """Call action(session), retrying once with a new login if the session has expired."""
+        session = self.get(username, password)
+        try:
+            return action(session)
+        except SessionExpired:
+            return action(self.relogin(username, password, expired=session))
+
+    def invalidate(self, username=None, keep_cookies=False):
+        """Forget the session (and unless keep_cookies, the stored cookies) of one user, or of every user."""
+        with self._lock:
+            if username is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(username, None)
+        if self.cookie_store is not None and not keep_cookies:
+            self.cookie_store.forget(username, self.name)
+
+    def stats(self):
+        with self._lock:
+            size = len(self._sessions)
+        return {
+            'name': self.name,
+            'sessions': size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'relogins': self.relogins,
+            'restored': self.restored,
+            'evicted': self.evicted,
+        }
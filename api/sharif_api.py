@@ -1,15 +1,83 @@
 import json
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
-from api.configurations import load_config, save_config
-from api.connection.inside import connect_via_requests, disconnect_current_session, disconnect_session, \
-    get_online_sessions
-from api.connection.network import check_sharif_network, get_ip_address
-from api.connection.vpn import connect_vpn, disconnect_vpn
-from api.metadata.connections_logs import get_bandwidth_logs
-from api.metadata.profile import get_data
+from api import metrics, startup
+from api.cache import ResultCache
+from api.configurations import load_config, log_event, save_config
+from api.connection.monitor import StateMonitor
+from api.connection.ip_resolver import IpResolver
+from api.connection.network import get_probe_report
+from api.connection.supervisor import ReconnectSupervisor
+from api.jobs import JobManager
 
-config = load_config()
+# The scraping/HTTP modules (requests) are imported inside the methods that need them,
+# so creating the API and showing the window does not pay for them.
+
+STATIC_DIR = Path(getattr(sys, '_MEIPASS', Path(__file__).resolve().parent.parent)) / 'static'
+
+USAGE_SYNC_INTERVAL = 600  # seconds between background syncs of the local usage store
+
+# Seconds a single step of a background job may take before it is abandoned
+STEP_DEADLINES = {
+    'probing': 5,
+    'dialing': 60,
+    'fetching_ip': 5,
+}
+
+# Steps that talk to a portal get as long as their longest request sequence may take with the timeouts and
+# retries of api.transport: log in, the call comes back expired, log in again, the call (see flow_deadline)
+_NET_LOGIN = (('GET', 'auth'), ('POST', 'auth'))
+_CAS_LOGIN = (('GET', 'auth'), ('POST', 'auth'), ('GET', 'auth'), ('GET', 'auth'))  # last one: service ticket
+_BW_LOGIN = (('GET', 'auth'), ('POST', 'auth'), ('GET', 'auth'))
+FLOW_REQUESTS = {
+    'connect': 2 * (_NET_LOGIN + (('GET', 'page'),)) + (('POST', 'json'),),
+    'disconnect': 2 * (_NET_LOGIN + (('GET', 'page'), ('GET', 'json'))) + (('GET', 'json'),),
+    'profile': 2 * (_CAS_LOGIN + (('GET', 'page'),)),
+    'sessions': 2 * (_NET_LOGIN + (('GET', 'page'), ('GET', 'json'))),
+    'logs': 2 * (_BW_LOGIN + (('GET', 'stream'),)),
+}
+
+# Seconds each cached result stays fresh; older entries are served while being refreshed
+CACHE_TTLS = {
+    'profile': 3600,
+    'sessions': 30,
+    'logs': 300,
+}
+
+
+def flow_deadline(flow):
+    """Seconds the portal requests of a connect/disconnect/profile/sessions/logs step may take."""
+    from api import transport
+
+    return transport.worst_case(*FLOW_REQUESTS[flow])
+
+
+# Pages whose portal flows start right after login, each on its own host, so they run side by side
+WARMUP_PAGES = ('profile', 'sessions', 'logs')
+
+# Bridge methods batch() may run: reads, none of which connects, disconnects or saves anything. They may load what
+# they return on demand: profile, sessions and get_logs can log in to a portal (and fill the cache), update_state
+# and current_ip can probe the network
+BATCH_METHODS = frozenset({
+    'update_state', 'current_ip', 'config_data', 'get_language_data', 'get_settings', 'startup_report',
+    'dashboard_snapshot', 'usage_summary', 'usage_daily', 'profile', 'sessions', 'get_logs', 'info', 'get_metrics',
+    'probe_report', 'ip_report', 'reconnect_stats', 'session_stats', 'transport_stats', 'cache_stats',
+    'vpn_report', 'warmup_report',
+})
+
+# Settings saved in the config file; kill_switch is shown but not implemented yet
+DEFAULT_SETTINGS = {
+    'auto_connect': False,
+    'kill_switch': True,
+    'start_with_os': False,
+    'notifications': True,
+    'auto_update': True,
+    'theme': 'auto',
+}
 
 
 class SharifConnectAPI:
@@ -20,17 +88,84 @@ class SharifConnectAPI:
         self.password = ''
         self.username = ''
         self.remember_me = False
-        if config.get("remember"):
-            self.username = config.get("username", "")
-            self.password = config.get("password", "")
-            self.remember_me = True
         self.state = -1
-        self.load_languages()
+        self.languages = {}
+        self._config = {}
+        self._window = None
+        self._cache = ResultCache(CACHE_TTLS)
+        self._usage_sync = None
+        self._warmup = {}
+        self._batch_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="batch")
+        self._jobs = JobManager(max_workers=4, on_event=self._push_job_event)
+        self._settings = dict(DEFAULT_SETTINGS)
+        self._monitor = StateMonitor()
+        self._monitor.add_listener(self._on_state_change)
+        self._supervisor = ReconnectSupervisor(self._monitor, self._auto_reconnect)
+        self._ip = IpResolver(on_change=self._push_ip)
+        self._ip.add_source('net.sharif.ir sessions', self._portal_ip)
+        # Config (PBKDF2 + file I/O) and languages load off the UI thread
+        self._ready = threading.Event()
+        threading.Thread(target=self._load_startup_data, name="startup", daemon=True).start()
+
+    def _load_startup_data(self):
+        try:
+            self._config = load_config()
+            self._settings.update(self._config.get("settings", {}))
+            if self._config.get("remember"):
+                self.username = self._config.get("username", "")
+                self.password = self._config.get("password", "")
+                self.remember_me = True
+            startup.mark('config_loaded')
+            self.load_languages()
+            startup.mark('languages_loaded')
+            if self.remember_me:
+                from api.cookie_store import get_cookie_store
+                get_cookie_store().load()
+        finally:
+            self._ready.set()
+
+    def attach_window(self, window):
+        """Remember the webview window so state changes can be pushed to the UI"""
+        self._window = window
+
+    def _on_state_change(self, old_state, new_state):
+        self.state = new_state
+        # The public IP only changes with the link; resolve the new one before the UI asks
+        self._ip.invalidate()
+        if new_state in (1, 2):
+            self._ip.refresh_async()
+        if self._window is not None:
+            try:
+                self._window.evaluate_js(
+                    f"window.onConnectionStateChanged && window.onConnectionStateChanged({new_state})")
+            except Exception as e:
+                log_event(f"Pushing connection state {new_state} to the UI failed: {e}")
+
+    def _push_ip(self, ip):
+        if self._window is not None:
+            try:
+                self._window.evaluate_js(f"window.onIpChanged && window.onIpChanged({json.dumps(ip)})")
+            except Exception as e:
+                log_event(f"Pushing the IP to the UI failed: {e}")
+
+    def _portal_ip(self):
+        # The sessions JSON of net.sharif.ir carries our IP; use it only when it costs no login
+        if self.state not in (2, 3):
+            return None
+        cached = self._cache.peek(self.username, 'sessions')
+        if cached and cached['result'] is True:
+            return cached['data'].get('ip')
+        from api.connection.inside import fetch_online_sessions, session_pool
+        session = session_pool.peek(self.username)
+        if session is None:
+            return None
+        success, data, _ = fetch_online_sessions(session)
+        return data.get('ip') if success else None
 
     def load_languages(self):
         """Load language files"""
         try:
-            with open('../static/lang/languages.json', 'r', encoding='utf-8') as f:
+            with open(STATIC_DIR / 'lang' / 'languages.json', 'r', encoding='utf-8') as f:
                 self.languages = json.load(f)
         except FileNotFoundError:
             # Fallback if language file doesn't exist
@@ -41,6 +176,7 @@ class SharifConnectAPI:
 
     def get_language_data(self):
         """Return current language data"""
+        self._ready.wait()
         return {
             'current': self.current_language,
             'data': self.languages.get(self.current_language, {})
@@ -48,6 +184,7 @@ class SharifConnectAPI:
 
     def switch_language(self, lang_code):
         """Switch application language"""
+        self._ready.wait()
         if lang_code in self.languages:
             self.current_language = lang_code
             return True
@@ -55,19 +192,81 @@ class SharifConnectAPI:
 
     def config_data(self):
         """Load configuration file"""
+        self._ready.wait()
         if self.remember_me:
-            return config
+            return self._config
         return {}
 
-    def login(self, username, password, remember_me):
-        """Login to Sharif Connect"""
+    def report_first_paint(self, dom_ms=None, build=None, styled_ms=None):
+        """Called by the UI once the first page is painted and styled; logs the startup timing report"""
+        startup.mark('first_paint')
+        report = self.startup_report()
+        report['dom_first_paint'] = dom_ms
+        report['dom_styled'] = styled_ms
+        report['build'] = build
+        log_event(f"Startup timing (ms): {json.dumps(report)}")
+        return report
+
+    def startup_report(self):
+        """Get ms since process start for each startup step (imports, config, first paint)"""
+        return startup.report()
+
+    def batch(self, calls):
+        """Run several bridge calls ([name, *args] or a name each) in one crossing; results come back in order"""
+        started = time.perf_counter()
+
+        def run(call):
+            name, args = (call, []) if isinstance(call, str) else (call[0], list(call[1:]))
+            if name not in BATCH_METHODS:
+                return {'method': name, 'error': f'Not allowed in a batch: {name}'}
+            try:
+                return {'method': name, 'result': getattr(self, name)(*args)}
+            except Exception as e:
+                log_event(f"Batched call {name} failed: {e}")
+                return {'method': name, 'error': str(e)}
+
+        # The calls are independent, so a slow one (e.g. a scrape) doesn't hold up the others
+        results = [run(calls[0])] if len(calls) == 1 else list(self._batch_pool.map(run, calls))
+        return {
+            'success': all('error' not in result for result in results),
+            'results': results,
+            'ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def dashboard_snapshot(self):
+        """Get state, IP, online session count and usage together (memory and the local store, no scraping)"""
+        if not self.logged_in:
+            return {'success': False, 'message': 'Please login again'}
+        state = self.update_state()
+        # Only what the sessions page (or the warm-up) already fetched; None until then
+        cached = self._cache.peek(self.username, 'sessions')
+        session_count = None
+        if cached and cached['result'] is True:
+            session_count = len(cached['data'].get('result', [[]])[0])
+        return {
+            'success': True,
+            'state': state,
+            'ip': self.current_ip(),
+            'sessions': session_count,
+            'usage': self.usage_summary(),
+        }
+
+    def login(self, username, password, remember_me, save=True, watch=True):
+        """Login to Sharif Connect (the headless one-shot commands neither save the login nor watch/warm up)"""
+        self._ready.wait()
         # Simulate login validation
         if username and password:
             self.logged_in = True
             self.username = username
             self.password = password
             self.remember_me = remember_me
-            save_config({"username": username, "password": password, "remember": remember_me})
+            if save:
+                self._save_config()
+            if watch:
+                self._monitor.start()
+                self._supervisor.set_enabled(self._settings['auto_connect'])
+                self._supervisor.want(self._settings['auto_connect'])
+                threading.Thread(target=self._warm_up, name="warmup", daemon=True).start()
             return {
                 'success': True,
                 'message': 'Login successful',
@@ -78,15 +277,61 @@ class SharifConnectAPI:
             'message': 'Invalid credentials'
         }
 
+    def _warm_up(self):
+        # Fill the result cache for the pages; a page opened meanwhile joins the load in flight
+        loaders = {'profile': self.profile, 'sessions': self.sessions, 'logs': self.get_logs}
+        flows = {}
+
+        def run(name):
+            started = time.perf_counter()
+            try:
+                result = loaders[name]()
+                success = 'error' not in result and result.get('success', result.get('result')) is not False
+            except Exception as e:
+                log_event(f"Warm-up of {name} failed: {e}")
+                success = False
+            flows[name] = {'ms': round((time.perf_counter() - started) * 1000, 1), 'success': success}
+
+        self._warmup = {'running': True, 'started': time.time()}
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(WARMUP_PAGES), thread_name_prefix="warmup") as executor:
+            list(executor.map(run, WARMUP_PAGES))
+        wall = round((time.perf_counter() - started) * 1000, 1)
+        serial = round(sum(flow['ms'] for flow in flows.values()), 1)
+        self._warmup = {
+            'running': False,
+            'started': self._warmup['started'],
+            'wall_ms': wall,
+            'serial_ms': serial,
+            'speedup': round(serial / wall, 2) if wall else None,
+            'flows': flows,
+        }
+        log_event("Warm-up finished", wall_ms=wall, serial_ms=serial,
+                  failed=[name for name, flow in flows.items() if not flow['success']])
+
+    def warmup_report(self):
+        """Get how long the post-login prefetch of profile/sessions/logs took, against running them one by one"""
+        return dict(self._warmup) or {'running': False, 'started': None}
+
     def logout(self):
         """Logout from Sharif Connect"""
         self.logged_in = False
+        self._supervisor.want(False)
+        self._monitor.stop()
+        for pool in self._session_pools():
+            pool.invalidate(self.username)
+        self._cache.invalidate(self.username)
         return {}
 
     def profile(self):
         """Get user profile information"""
         if not self.logged_in:
             return {'error': 'Not logged in'}
+        return self._cache.get(self.username, 'profile', self._load_profile,
+                               cacheable=lambda result: 'error' not in result)
+
+    def _load_profile(self):
+        from api.metadata.profile import get_data
         status, data = get_data(self.username, self.password)
         if status is False:
             return {'error': 'Username or password incorrect'}
@@ -114,59 +359,108 @@ class SharifConnectAPI:
 
     def sessions(self):
         """Get session history (0 to 3 sessions)"""
+        return self._cache.get(self.username, 'sessions', self._load_sessions,
+                               cacheable=lambda result: result['result'] is True)
+
+    def _load_sessions(self):
+        from api.connection.inside import get_online_sessions
         result, message, session = get_online_sessions(self.username, self.password)
         print(message)
         return {'result': result, 'data': message}
 
     def update_state(self):
-        """Get current connection state"""
-        self.state = check_sharif_network()  # return 0, 1, 2, 3
-        return self.state
+        """Get current connection state (kept fresh by the background monitor)"""
+        if self.state == -1:
+            self._monitor.refresh()
+        return self.state  # 0, 1, 2, 3
+
+    def ip_report(self):
+        """Get the cached IP and which source answered the last lookup, and how fast"""
+        return self._ip.report()
+
+    def probe_report(self):
+        """Get latency and per-probe results of the last state check"""
+        return get_probe_report()
 
     def connect(self):
         """Connect to SHARIF"""
-        # Connect with request (inside)
         if not self.logged_in:
             return {'success': False, 'message': 'Please login again'}
-        self.update_state()
+        return self._wait_job(self._start('connect'))
+
+    def _connect(self, job):
+        job.run_step('probing', self._monitor.refresh, STEP_DEADLINES['probing'])
+        # Connect with request (inside)
         if self.state == 2 or self.state == 1:
             res = True
         elif self.state == 3:
+            from api.connection.inside import connect_via_requests
 
-            res, data = connect_via_requests(self.username, self.password)
+            res, data = job.run_step('authenticating', lambda: connect_via_requests(self.username, self.password),
+                                     flow_deadline('connect'))
         # Connect with Vpn (outside)
         elif self.state == 0:
+            from api.connection.vpn import connect_vpn
 
-            res, data = connect_vpn(self.username, self.password)
+            res, data = job.run_step('dialing', lambda: connect_vpn(self.username, self.password),
+                                     STEP_DEADLINES['dialing'])
         else:
 
             return {'success': False, 'message': 'Check the network can not get the SHARIF network'}
+        self._monitor.kick()
+        self._cache.invalidate(self.username, 'sessions', 'logs')
+        if res:
+            self._supervisor.want(True)
+        ip = job.run_step('fetching_ip', self._ip.resolve, STEP_DEADLINES['fetching_ip'])
         return {
             'success': res,
             'status': 'connected',
             'message': 'Successfully connected to Sharif Connect',
             'server': 'Sharif',
-            'ip': get_ip_address(),
+            'ip': ip,
             'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
         }
-    def current_ip(self):
+    def current_ip(self, wait=False):
         if not self.logged_in:
             return {'success': False, 'message': 'Please login again'}
         if self.state == 2 or self.state == 1:
-            return {'success': True, 'ip': get_ip_address()}
+            ip = (self._ip.resolve() or None) if wait else self._ip.get()
+            if ip is None:
+                # Answered later through window.onIpChanged
+                self._ip.refresh_async()
+                return {'success': False, 'pending': True, 'message': 'Resolving IP'}
+            return {'success': True, 'ip': ip}
         else:
             return {'success': False, 'message': 'You are not connected to Sharif Connect'}
 
     def disconnect(self):
         """Disconnect from VPN"""
+        return self._wait_job(self._start('disconnect'))
+
+    def _disconnect(self, job):
         success = False
-        self.update_state()
+        # A disconnect the user asked for must not be undone by auto-reconnect
+        self._supervisor.want(False)
+        connecting = self._jobs.inflight(('connect', self.username))
+        if connecting is not None:
+            # Stop the connect and wait until its dial/login has really returned, then undo whatever it set up
+            job.progress('cancelling', 'Stopping the connect in progress')
+            connecting.cancel()
+            connecting.settle()
+            self._supervisor.want(False)
+        job.run_step('probing', self._monitor.refresh, STEP_DEADLINES['probing'])
         if self.state == 0 or self.state == 3:
             success, msg = True, ""
         elif self.state == 1:  # vpn is on
-            success, msg = disconnect_vpn()
+            from api.connection.vpn import disconnect_vpn
+            success, msg = job.run_step('dialing', disconnect_vpn, STEP_DEADLINES['dialing'])
         elif self.state == 2:  # connect in inside
-            success, msg = disconnect_current_session(self.username, self.password)
+            from api.connection.inside import disconnect_current_session
+            success, msg = job.run_step('authenticating',
+                                        lambda: disconnect_current_session(self.username, self.password),
+                                        flow_deadline('disconnect'))
+        self._monitor.kick()
+        self._cache.invalidate(self.username, 'sessions', 'logs')
 
         if success is True:
             self.connected = False
@@ -178,17 +472,80 @@ class SharifConnectAPI:
             }
         return {'success': False, 'massage': 'Disconnect is not successful'}
 
+    def _start(self, name):
+        jobs = {
+            'connect': self._connect,
+            'disconnect': self._disconnect,
+            'profile': lambda job: job.run_step('fetching', self.profile, flow_deadline('profile')),
+            'sessions': lambda job: job.run_step('fetching', self.sessions, flow_deadline('sessions')),
+            'logs': lambda job: job.run_step('fetching', self.get_logs, flow_deadline('logs')),
+        }
+        # A second click on the same action joins its in-flight job; a disconnect stops a connect (_disconnect)
+        return self._jobs.submit(name, jobs[name], key=(name, self.username))
+
+    def _wait_job(self, job):
+        job.wait()
+        if job.status == 'done':
+            return job.result
+        if job.status == 'cancelled':
+            return {'success': False, 'message': 'Cancelled'}
+        return {'success': False, 'message': job.error}
+
+    def _push_job_event(self, event):
+        if self._window is not None:
+            try:
+                self._window.evaluate_js(f"window.onJobEvent && window.onJobEvent({json.dumps(event)})")
+            except Exception as e:
+                log_event(f"Pushing a job event to the UI failed: {e}")
+
+    def start_job(self, name):
+        """Start connect/disconnect/profile/sessions/logs in the background and return its job id"""
+        if name not in ('connect', 'disconnect', 'profile', 'sessions', 'logs'):
+            return {'success': False, 'message': f'Unknown job: {name}'}
+        if not self.logged_in:
+            return {'success': False, 'message': 'Please login again'}
+        job = self._start(name)
+        return {'success': True, 'job_id': job.id, 'name': job.name}
+
+    def job_status(self, job_id, since=0):
+        """Get status, result and the progress events after `since` of a job"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return {'success': False, 'message': 'Unknown job'}
+        return {'success': True, **job.snapshot(since)}
+
+    def cancel_job(self, job_id):
+        """Ask a running job to stop at its next step"""
+        return {'success': self._jobs.cancel(job_id)}
+
     def disconnect_one_sessions(self, ras_ip, session_ip, session_id):
-        print(ras_ip, session_ip, session_id)
-        a, b, session = get_online_sessions(self.username, self.password)
-        if a is True:
-            success, msg = disconnect_session(session, ras_ip, session_ip, session_id)
-            if success is True:
-                return {'success': True, 'messages': f'Disconnected IP: {session_ip}'}
-            else:
-                return {'success': False, 'messages': 'Disconnect is not successful'}
-        else:
-            return {'success': False, 'messages': 'Cant load sessions'}
+        """Disconnect one session"""
+        return self.disconnect_sessions([{'ras_ip': ras_ip, 'session_ip': session_ip, 'session_id': session_id}])
+
+    def disconnect_sessions(self, sessions):
+        """Disconnect several sessions (dicts with ras_ip, session_ip, session_id) with one login"""
+        from api.connection.inside import disconnect_sessions
+        return self._disconnect_many(lambda: disconnect_sessions(self.username, self.password, sessions))
+
+    def disconnect_other_sessions(self):
+        """Disconnect every session except the current one"""
+        from api.connection.inside import disconnect_other_sessions
+        return self._disconnect_many(lambda: disconnect_other_sessions(self.username, self.password))
+
+    def _disconnect_many(self, disconnect):
+        if not self.logged_in:
+            return {'success': False, 'messages': 'Please login again'}
+        success, results, sessions = disconnect()
+        self._cache.invalidate(self.username, 'sessions')
+        if success is False:
+            return {'success': False, 'messages': results}
+        if sessions is not None:
+            self._cache.put(self.username, 'sessions', {'result': True, 'data': sessions})
+        return {
+            'success': all(r['success'] for r in results),
+            'results': results,
+            'sessions': {'result': sessions is not None, 'data': sessions},
+        }
 
     def change(self, new_username=None, new_password=None, current_password=None):
         """Change username or password"""
@@ -200,6 +557,9 @@ class SharifConnectAPI:
             return {'success': False, 'message': 'Current password is incorrect'}
 
         changes_made = []
+        for pool in self._session_pools():
+            pool.invalidate(self.username)
+        self._cache.invalidate(self.username)
 
         if new_username:
             self.username = new_username
@@ -208,8 +568,8 @@ class SharifConnectAPI:
         if new_password:
             self.password = new_password
             changes_made.append('password')
-        save_config(
-            {"username": self.username, "password": self.password, "remember": True})  # Todo : add remember me in front
+        self.remember_me = True  # Todo : add remember me in front
+        self._save_config()
         if changes_made:
             return {
                 'success': True,
@@ -219,34 +579,127 @@ class SharifConnectAPI:
 
         return {'success': False, 'message': 'No changes specified'}
 
-    def get_logs(self):
-        """Get application logs"""
-        success, data = get_bandwidth_logs(self.username, self.password)
+    def get_logs(self, offset=0, limit=30):
+        """Get application logs (a page of the bandwidth connection history)"""
+        endpoint = 'logs' if (offset, limit) == (0, 30) else f'logs:{offset}:{limit}'
+        return self._cache.get(self.username, endpoint, lambda: self._load_logs(offset, limit),
+                               cacheable=lambda result: result['success'] is True)
+
+    def _load_logs(self, offset=0, limit=30):
+        from api.metadata.connections_logs import get_bandwidth_logs
+        # One extra row tells whether there is a next page
+        success, data = get_bandwidth_logs(self.username, self.password, offset, None if limit is None else limit + 1)
         if success is False:
             return {'success': False, 'message': 'Cant get logs'}
+        if offset == 0:
+            from api.metadata.usage_store import get_usage_store
+            get_usage_store().add(self.username, data)
         return {
             'success': True,
-            'data': data
+            'data': data[:limit],
+            'offset': offset,
+            'limit': limit,
+            'has_more': limit is not None and len(data) > limit,
         }
 
+    def sync_usage(self):
+        """Fetch only the connection rows newer than the local usage store and append them"""
+        from api.metadata.connections_logs import get_bandwidth_logs
+        from api.metadata.usage_store import get_usage_store
+        store = get_usage_store()
+        success, data = get_bandwidth_logs(self.username, self.password, limit=None,
+                                           until=store.known_rows(self.username))
+        if success is False:
+            return {'success': False, 'message': 'Cant get logs'}
+        return {'success': True, 'added': store.add(self.username, data, complete=True)}
+
+    def usage_summary(self):
+        """Get today/week/month upload and download from the local usage store (no network access)"""
+        if not self.logged_in:
+            return {'success': False, 'message': 'Please login again'}
+        from api.metadata.usage_store import get_usage_store
+        summary = get_usage_store().summary(self.username)
+        synced_at = summary['synced_at']
+        if (synced_at is None or time.time() - synced_at > USAGE_SYNC_INTERVAL) and \
+                not (self._usage_sync and self._usage_sync.is_alive()):
+            self._usage_sync = threading.Thread(target=self.sync_usage, name="usage-sync", daemon=True)
+            self._usage_sync.start()
+        return {'success': True, 'data': summary}
+
+    def usage_daily(self, days=30):
+        """Get per-day upload and download from the local usage store"""
+        if not self.logged_in:
+            return {'success': False, 'message': 'Please login again'}
+        from api.metadata.usage_store import get_usage_store
+        return {'success': True, 'data': get_usage_store().daily(self.username, days)}
+
+    def _session_pools(self):
+        from api.connection.inside import session_pool
+        from api.metadata.connections_logs import bw_pool
+        from api.metadata.profile import cas_pool
+        return [session_pool, cas_pool, bw_pool]
+
+    def session_stats(self):
+        """Get hit/miss/relogin/restored counters of the pooled portal sessions"""
+        return {pool.name: pool.stats() for pool in self._session_pools()}
+
+    def transport_stats(self):
+        """Get the timeouts per endpoint class and the circuit breaker state of each portal host"""
+        from api import transport
+        return transport.stats()
+
+    def vpn_report(self):
+        """Get the VPN backend in use and how long its recent dials took (profile setup vs. dial)"""
+        from api.connection.vpn import get_backend
+        return get_backend().report()
+
+    def cache_stats(self):
+        """Get hit/miss counters of the profile/sessions/logs result cache"""
+        return self._cache.stats()
+
+    def get_metrics(self, since=0):
+        """Get timing histograms and recent HTTP/probe/subprocess/parse events"""
+        return metrics.snapshot(since)
+
+    def set_metrics_enabled(self, enabled):
+        """Turn the hot-path instrumentation on or off"""
+        return {'success': True, 'enabled': metrics.set_enabled(enabled)}
+
+    def export_metrics(self):
+        """Save the collected timings as JSON in the logs folder"""
+        try:
+            return {'success': True, 'path': metrics.export_json()}
+        except OSError as e:
+            return {'success': False, 'message': str(e)}
+
+    def _save_config(self):
+        save_config({"username": self.username, "password": self.password, "remember": self.remember_me,
+                     "settings": self._settings})
+
+    def _auto_reconnect(self):
+        # Runs the same job as the Connect button, so the UI sees its progress
+        return self._wait_job(self._start('connect')).get('success') is True
+
     def get_settings(self):
         """Get current settings"""
-        return {
-            'auto_connect': False,
-            'kill_switch': True,
-            'start_with_os': False,  # Start with OS option
-            'notifications': True,
-            'auto_update': True,
-            'language': self.current_language,
-            'theme': 'auto'
-        }
+        self._ready.wait()
+        return {**self._settings, 'language': self.current_language}
 
     def update_settings(self, settings):
-        """Update application settings"""
-        # Here you would typically save settings to a file or registry
-        # For now, we'll just return success
+        """Update application settings and save them in the config file"""
+        self._ready.wait()
+        changed = {key: value for key, value in settings.items() if key in DEFAULT_SETTINGS}
+        self._settings.update(changed)
+        self._save_config()
+        if 'auto_connect' in changed and self.logged_in:
+            self._supervisor.set_enabled(self._settings['auto_connect'])
+            self._supervisor.want(self._settings['auto_connect'] or self.state in (1, 2))
         return {
             'success': True,
             'message': 'Settings updated successfully',
-            'settings': settings
+            'settings': self.get_settings()
         }
+
+    def reconnect_stats(self):
+        """Get drop/reconnect counters and how long the link stayed down (auto_connect)"""
+        return self._supervisor.stats()
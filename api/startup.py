@@ -0,0 +1,21 @@
+import threading
+import time
+
+# Imported first thing by main.py, so this is as close to process start as we get
+_started = time.perf_counter()
+_lock = threading.Lock()
+_marks = {}
+
+
+def mark(name):
+    """Record how many ms after start the given startup step finished (first call wins)."""
+    elapsed = round((time.perf_counter() - _started) * 1000, 1)
+    with _lock:
+        _marks.setdefault(name, elapsed)
+    return elapsed
+
+
+def report():
+    """Return the recorded startup steps in ms since start, in the order they happened."""
+    with _lock:
+        return dict(sorted(_marks.items(), key=lambda item: item[1]))
@@ -0,0 +1,199 @@
+"""
+One HTTP transport for every portal module: shared keep-alive connection pools, a timeout on every request,
+retries with jittered backoff for idempotent calls, a circuit breaker per host and optional per-host rate limits.
+"""
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from api import metrics
+from api.configurations import log_event
+
+# (connect, read) seconds per endpoint class
+TIMEOUTS = {
+    'auth': (3.05, 15),  # login forms and posts
+    'page': (3.05, 15),  # HTML pages
+    'json': (3.05, 10),  # XHR endpoints (online sessions, disconnect, connect)
+    'stream': (3.05, 30),  # large streamed pages; the read timeout applies per chunk
+    'ip': (2, 3),  # public IP lookups
+}
+DEFAULT_TIMEOUT = TIMEOUTS['page']
+
+RETRIES = 2  # extra attempts for idempotent requests (GET/HEAD/OPTIONS) and failed connects
+BACKOFF = 0.3  # seconds, doubled after each failed attempt
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+RETRY_STATUSES = (502, 503, 504)
+
+BREAKER_THRESHOLD = 5  # consecutive failures that open a host's circuit
+BREAKER_COOLDOWN = 30  # seconds an open circuit rejects requests before letting one through
+
+
+class CircuitOpen(requests.ConnectionError):
+    """Raised without touching the network while a host's circuit is open."""
+
+
+class JitterRetry(Retry):
+    """urllib3 Retry whose backoff gets up to 50% random jitter, so parallel callers don't retry in lockstep."""
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return backoff + random.uniform(0, backoff / 2) if backoff else 0
+
+
+class CircuitBreaker:
+    """Count consecutive failures per host; past the threshold, fail fast until the cooldown is over."""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._hosts = {}  # host -> {'failures', 'opened', 'trial'}
+        self._lock = threading.Lock()
+
+    def allow(self, host):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state['opened'] is None:
+                return True
+            if time.monotonic() - state['opened'] < self.cooldown or state['trial']:
+                return False
+            state['trial'] = True  # half-open: one request decides whether the circuit closes
+            return True
+
+    def record(self, host, ok):
+        with self._lock:
+            state = self._hosts.setdefault(host, {'failures': 0, 'opened': None, 'trial': False})
+            state['trial'] = False
+            if ok:
+                state['failures'] = 0
+                state['opened'] = None
+                return
+            state['failures'] += 1
+            if state['failures'] >= self.threshold:
+                if state['opened'] is None:
+                    log_event(f"Circuit for {host} opened after {state['failures']} failures")
+                state['opened'] = time.monotonic()
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                host: {
+                    'failures': state['failures'],
+                    'open': state['opened'] is not None and now - state['opened'] < self.cooldown,
+                }
+                for host, state in self._hosts.items()
+            }
+
+
+class TokenBucket:
+    """Let `rate` requests per second through on average, in bursts of up to `burst`; callers past that wait."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self):
+        """Take one token, sleeping until it is available; return the seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve the token even if it is not there yet, so waiting callers are served in order
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited += wait
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class TransportAdapter(HTTPAdapter):
+    """HTTPAdapter that adds the default timeout, the retry policy, the circuit breaker and its own rate limits.
+
+    rate_limits maps host[:port] (as in the URL) to a TokenBucket; it only throttles sessions this adapter is
+    mounted into, so a bulk job with its own adapter (new_session(its_adapter)) does not slow the app down.
+    """
+
+    def __init__(self, breaker, rate_limits=None, **kwargs):
+        self.breaker = breaker
+        self.rate_limits = {} if rate_limits is None else rate_limits
+        retry = JitterRetry(total=RETRIES, connect=RETRIES, read=RETRIES, status=RETRIES,
+                            backoff_factor=BACKOFF, status_forcelist=RETRY_STATUSES,
+                            allowed_methods=IDEMPOTENT_METHODS, raise_on_status=False,
+                            respect_retry_after_header=True)
+        super().__init__(max_retries=retry, **kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        host = urlsplit(request.url).netloc
+        if not self.breaker.allow(host):
+            raise CircuitOpen(f"{host} is failing, not retrying for now", request=request)
+        bucket = self.rate_limits.get(host)
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            response = super().send(request, timeout=timeout or DEFAULT_TIMEOUT, **kwargs)
+        except requests.RequestException:
+            self.breaker.record(host, False)
+            raise
+        self.breaker.record(host, response.status_code < 500)
+        return response
+
+
+breaker = CircuitBreaker()
+# Mounted into every session, so all of them share the per-host keep-alive pools
+adapter = TransportAdapter(breaker, pool_connections=16, pool_maxsize=16)
+_session = None
+_session_lock = threading.Lock()
+
+
+def new_session(transport_adapter=None):
+    """Return a requests session over the shared adapter (or transport_adapter), with the metrics hook attached."""
+    transport_adapter = transport_adapter or adapter
+    session = requests.Session()
+    session.mount('http://', transport_adapter)
+    session.mount('https://', transport_adapter)
+    return metrics.instrument(session)
+
+
+def request(method, url, endpoint='page', **kwargs):
+    """Send a one-off request (no cookies worth keeping) through a shared session."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = new_session()
+    kwargs.setdefault('timeout', TIMEOUTS[endpoint])
+    return _session.request(method, url, **kwargs)
+
+
+def worst_case(*requests):
+    """Seconds the (method, endpoint) requests can take one after another when every attempt runs into its timeout.
+
+    Every request retries a failed connect; only idempotent ones retry after a read timeout. Redirects followed
+    by a request count as more requests.
+    """
+    # urllib3 sleeps BACKOFF * 2**(n-1) after the n-th failure in a row, nothing after the first; +50% jitter
+    backoff = sum(BACKOFF * 2 ** (n - 1) for n in range(2, RETRIES + 1)) * 1.5
+    attempts = RETRIES + 1
+    total = 0.0
+    for method, endpoint in requests:
+        connect, read = TIMEOUTS[endpoint]
+        total += attempts * connect + (attempts if method in IDEMPOTENT_METHODS else 1) * read + backoff
+    return round(total, 1)
+
+
+def stats():
+    return {
+        'timeouts': TIMEOUTS,
+        'hosts': breaker.stats(),
+        'rate_limits': {host: {'rate': bucket.rate, 'burst': bucket.burst, 'waited_s': round(bucket.waited, 3)}
+                        for host, bucket in adapter.rate_limits.items()},
+    }
@@ -0,0 +1,95 @@
+"""
+Compare the single-pass extractors in api.html_extract with the BeautifulSoup code they replaced.
+
+    python -m benchmarks.bench_extract --iterations 200
+
+Runs offline on the mock portal pages. BeautifulSoup (beautifulsoup4) is only needed for the baseline rows.
+"""
+import argparse
+import json
+import statistics
+import time
+
+from api.html_extract import extract_inputs, extract_table
+from api.metadata.profile import PROFILE_FIELDS
+from benchmarks.bench_scrapers import percentile
+from benchmarks.mock_portal import LOGIN_FORM, connections_page, profile_page
+
+
+def pages(padding, rows):
+    filler = ("<div><p class=\"news\">" + "x" * 80 + "</p></div>") * max(1, padding // 100)
+    return {
+        # Real portal pages carry navigation/scripts around the form; the filler stands in for them
+        "login form": LOGIN_FORM.format(token="t" * 64).replace("</form>", "</form>" + filler),
+        "profile page": profile_page(filler),
+        "connections table": connections_page(rows),
+    }
+
+
+def scenarios(padding, rows):
+    page = pages(padding, rows)
+    names = list(PROFILE_FIELDS.values())
+    result = {
+        "csrf token / html_extract": lambda: extract_inputs(page["login form"], ["csrfmiddlewaretoken"]),
+        "profile fields / html_extract": lambda: extract_inputs(page["profile page"], names),
+        "30 table rows / html_extract": lambda: extract_table(page["connections table"], "csvtable", stop_after=30),
+        "all table rows / html_extract": lambda: extract_table(page["connections table"], "csvtable"),
+    }
+    try:
+        from bs4 import BeautifulSoup
+    except ImportError:
+        return dict(sorted(result.items()))
+
+    def soup_table():
+        table = BeautifulSoup(page["connections table"], "html.parser").find("table", id="csvtable")
+        return [[td.get_text(" ", strip=True) for td in tr.find_all("td")] for tr in table.tbody.find_all("tr")]
+
+    def soup_profile():
+        soup = BeautifulSoup(page["profile page"], "html.parser")
+        return {name: soup.find("input", attrs={"name": name})["value"] for name in names}
+
+    result.update({
+        "csrf token / BeautifulSoup": lambda: BeautifulSoup(page["login form"], "html.parser").find(
+            "input", attrs={"name": "csrfmiddlewaretoken"})["value"],
+        "profile fields / BeautifulSoup": soup_profile,
+        "all table rows / BeautifulSoup": soup_table,
+    })
+    return dict(sorted(result.items()))
+
+
+def run_benchmark(name, fn, iterations):
+    fn()
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return {
+        "name": name,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p90_ms": round(percentile(latencies, 90), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--padding", type=int, default=20_000, help="bytes of markup around the forms")
+    parser.add_argument("--rows", type=int, default=2000, help="rows in the connections table")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = [run_benchmark(name, fn, args.iterations) for name, fn in scenarios(args.padding, args.rows).items()]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        width = max(len(r["name"]) for r in results)
+        print("name".ljust(width), "p50_ms".rjust(9), "p90_ms".rjust(9), "mean_ms".rjust(9))
+        for r in results:
+            print(r["name"].ljust(width), *(str(r[c]).rjust(9) for c in ("p50_ms", "p90_ms", "mean_ms")))
+    return results
+
+
+if __name__ == "__main__":
+    main()
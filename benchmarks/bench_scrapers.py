@@ -0,0 +1,125 @@
+"""
+Benchmark the auth/scraping paths against the local mock portal.
+
+    python -m benchmarks.bench_scrapers --iterations 50 --latency 0.02
+
+Reports per-call latency percentiles, HTTP requests per call and bytes the mock served per call (an upper
+bound of the bytes parsed; streamed pages may stop early),
+cold (fresh login), restored (cookies from the encrypted store, as after a restart) and warm (pooled login).
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from api.cookie_store import CookieStore
+from benchmarks.mock_portal import MockPortal, point_at
+
+USERNAME = "bench"
+PASSWORD = "secret"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def scenarios():
+    from api.connection import inside
+    from api.metadata import connections_logs, profile
+
+    def cold(fn, pool):
+        def run():
+            pool.invalidate()
+            return fn()
+        return run
+
+    def restored(fn, pool):
+        # Like the first call after a restart: no session in memory, cookies in the store
+        def run():
+            pool.invalidate(keep_cookies=True)
+            return fn()
+        return run
+
+    connect = lambda: inside.connect_via_requests(USERNAME, PASSWORD)
+    sessions = lambda: inside.get_online_sessions(USERNAME, PASSWORD)
+    get_profile = lambda: profile.get_data(USERNAME, PASSWORD)
+    return {
+        "connect_via_requests (cold)": cold(connect, inside.session_pool),
+        "connect_via_requests (warm)": connect,
+        "get_online_sessions (cold)": cold(sessions, inside.session_pool),
+        "get_online_sessions (restored)": restored(sessions, inside.session_pool),
+        "get_online_sessions (warm)": sessions,
+        "profile.get_data (cold)": cold(get_profile, profile.cas_pool),
+        "profile.get_data (restored)": restored(get_profile, profile.cas_pool),
+        "profile.get_data (warm)": get_profile,
+        "get_bandwidth_logs (30 rows, cold)": cold(lambda: connections_logs.get_bandwidth_logs(USERNAME, PASSWORD),
+                                                  connections_logs.bw_pool),
+        "get_bandwidth_logs (30 rows)": lambda: connections_logs.get_bandwidth_logs(USERNAME, PASSWORD),
+        "get_bandwidth_logs (all rows)": lambda: connections_logs.get_bandwidth_logs(USERNAME, PASSWORD, limit=None),
+    }
+
+
+def run_benchmark(mock, name, fn, iterations):
+    fn()  # warm-up, also fills the session pool for the warm scenarios
+    mock.reset_stats()
+    latencies = []
+    failures = 0
+    for _ in range(iterations):
+        started = time.perf_counter()
+        result = fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+        if not result[0]:
+            failures += 1
+    stats = mock.stats()
+    return {
+        "name": name,
+        "iterations": iterations,
+        "failures": failures,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p90_ms": round(percentile(latencies, 90), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "requests_per_call": round(stats["requests"] / iterations, 2),
+        "bytes_served_per_call": round(stats["bytes"] / iterations),
+    }
+
+
+def print_table(results):
+    columns = ["name", "p50_ms", "p90_ms", "p99_ms", "mean_ms", "requests_per_call", "bytes_served_per_call", "failures"]
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for result in results:
+        print("  ".join(str(result[c]).ljust(widths[c]) for c in columns))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the mock adds to every response")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of mock requests answered with 500")
+    parser.add_argument("--rows", type=int, default=2000, help="rows in the mock bandwidth table")
+    parser.add_argument("--only", help="run only scenarios whose name contains this text")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    with MockPortal(latency=args.latency, failure_rate=args.failure_rate, rows=args.rows) as mock, \
+            tempfile.TemporaryDirectory() as temp:
+        point_at(mock.url, CookieStore(Path(temp) / "cookies.enc"))
+        results = [run_benchmark(mock, name, fn, args.iterations)
+                   for name, fn in scenarios().items() if not args.only or args.only in name]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Compare the startup timing of the dist build (python build.py) with the source tree (Tailwind runtime).
+
+    python -m benchmarks.first_paint
+
+Launch the app a few times with each build and run this: every launch logs a "Startup timing (ms)" line
+(SharifConnectAPI.report_first_paint), which this reads back from the log and its gzipped rotations.
+"""
+import argparse
+import gzip
+import json
+import statistics
+
+from api.configurations import LOG_FILE, LOGS_DIR
+
+MARKER = "Startup timing (ms): "
+COLUMNS = ("window_shown", "first_paint", "dom_first_paint", "dom_styled")
+
+
+def read_lines():
+    for path in sorted(LOGS_DIR.glob("*.log.gz")):
+        with gzip.open(path, "rt", encoding="utf-8", errors="replace") as f:
+            yield from f
+    if LOG_FILE.exists():
+        with open(LOG_FILE, encoding="utf-8", errors="replace") as f:
+            yield from f
+
+
+def startup_reports():
+    for line in read_lines():
+        _, found, payload = line.partition(MARKER)
+        if found:
+            try:
+                yield json.loads(payload)
+            except ValueError:
+                continue
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--last", type=int, default=20, help="launches per build to use")
+    args = parser.parse_args(argv)
+
+    launches = {}
+    for report in startup_reports():
+        # Reports from before the build field existed came from the source tree
+        launches.setdefault(report.get("build") or "source", []).append(report)
+    if not launches:
+        raise SystemExit(f"No startup timing in {LOG_FILE}; start the app (python main.py) first")
+
+    print(f"{'build':8} {'launches':>8} " + " ".join(f"{column:>16}" for column in COLUMNS) + "   (median ms)")
+    for build, reports in sorted(launches.items()):
+        reports = reports[-args.last:]
+        cells = []
+        for column in COLUMNS:
+            values = [r[column] for r in reports if isinstance(r.get(column), (int, float))]
+            cells.append(f"{statistics.median(values):16.1f}" if values else f"{'-':>16}")
+        print(f"{build:8} {len(reports):8} " + " ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
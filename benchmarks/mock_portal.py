@@ -0,0 +1,350 @@
+"""
+Local stand-in for net.sharif.ir, the CAS at accounts.sharif.edu, register.sharif.edu and bw.ictc.sharif.edu.
+
+All portals are served from one HTTP server; their paths do not collide. Use point_at(portal.url) to
+send the api modules to it instead of the university servers.
+"""
+import json
+import random
+import secrets
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs, urlparse
+
+LOGIN_FORM = """<html><head><title>ورود</title></head><body>
+<form method="post" action="/en-us/user/login/">
+<input type="hidden" name="csrfmiddlewaretoken" value="{token}">
+<input name="username"><input name="password" type="password">
+<button>ورود</button></form></body></html>"""
+
+HOME_PAGE = """<html><head><title>Home</title></head><body>
+<h1>Welcome {username}</h1><button id="connect">Connect</button>{padding}</body></html>"""
+
+CAS_FORM = """<html><body><form method="post" action="/cas/login">
+<input name="username"><input name="password" type="password">
+<input type="hidden" name="execution" value="{execution}">
+<input type="hidden" name="_eventId" value="submit"><button>ورود</button></form></body></html>"""
+
+PROFILE_FIELDS = {
+    "cn": "کاربر آزمایشی",
+    "cn;lang-en-US": "Test User",
+    "nationalid": "0012345678",
+    "gender": "male",
+    "fathername": "Father",
+    "postaladdress": "Tehran, Azadi St.",
+    "postalcode": "1458889694",
+    "accountstatus": "active",
+    "telephonenumber": "02166165000",
+    "mobile": "09120000000",
+    "dcsubmailaddress": "test@sharif.edu",
+    "param": "student",
+}
+
+BW_LOGIN_FORM = """<html><body><form method="post" action="/login">
+<input name="normal_username"><input name="normal_password" type="password"></form></body></html>"""
+# The CAS and bw.ictc logins refuse this password, like a mistyped one
+WRONG_PASSWORD = "wrong"
+
+
+def profile_page(padding):
+    inputs = "\n".join(f'<div class="field"><label>{name}</label><input type="text" name="{name}" value="{value}" '
+                       f'readonly></div>' for name, value in PROFILE_FIELDS.items())
+    return f"<html><body>{padding}<form id=\"profile\">{inputs}</form>{padding}</body></html>"
+
+
+def connections_page(rows, now=None):
+    now = now or datetime(2025, 8, 1, 12, 0, 0)
+    body = []
+    for i in range(rows):
+        login = now - timedelta(hours=3 * i)
+        logout = login + timedelta(hours=2)
+        body.append(
+            f"<tr><td>{i + 1}</td><td>{login:%Y-%m-%d %H:%M:%S}</td><td>{logout:%Y-%m-%d %H:%M:%S}</td>"
+            f"<td>{(i * 37) % 900 + 1}.{i % 10} MB</td><td>{(i * 53) % 3000 + 1}.{i % 7} MB</td></tr>")
+    return ("<html><body><div class=\"nav\">" + "<a href=\"#\">link</a>" * 50 + "</div>"
+            "<table id=\"csvtable\" class=\"table\"><thead><tr><th>#</th><th>Login</th><th>Logout</th>"
+            "<th>Upload</th><th>Download</th></tr></thead><tbody>" + "".join(body) + "</tbody></table>"
+            "</body></html>")
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients stop reading streamed pages early and drop pooled connections; that is expected here.
+        pass
+
+
+class MockPortal:
+    """Threaded HTTP server reproducing the login forms, session JSON, disconnect endpoint and csvtable page."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, failure_rate=0.0, rows=2000,
+                 session_ttl=None, padding=20_000, seed=0):
+        self.latency = latency  # seconds added to every response
+        self.failure_rate = failure_rate  # share of requests answered with HTTP 500
+        self.rows = rows  # rows of the bandwidth csvtable
+        self.session_ttl = session_ttl  # seconds before a login expires (None: never)
+        self.padding = "<!-- " + "x" * padding + " -->" if padding else ""
+        self.random = random.Random(seed)
+        self.requests = Counter()
+        self.bytes_sent = 0
+        self._sessions = {}  # token -> (portal, username, created)
+        self._online = {}  # username -> list of online sessions
+        self.connected = set()  # users whose link is up: from aaa_ras_connect until their current session is dropped
+        self._lock = threading.Lock()
+        self._connections_page = connections_page(rows).encode()
+        self.server = _QuietServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="mock-portal", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests.clear()
+            self.bytes_sent = 0
+
+    def stats(self):
+        with self._lock:
+            return {'requests': sum(self.requests.values()), 'bytes': self.bytes_sent,
+                    'by_path': dict(self.requests)}
+
+    def _login(self, portal, username):
+        token = secrets.token_hex(16)
+        with self._lock:
+            self._sessions[token] = (portal, username, time.monotonic())
+        return token
+
+    def _user(self, portal, token):
+        with self._lock:
+            entry = self._sessions.get(token)
+        if not entry or entry[0] != portal:
+            return None
+        if self.session_ttl is not None and time.monotonic() - entry[2] > self.session_ttl:
+            return None
+        return entry[1]
+
+    def online_sessions(self, username):
+        with self._lock:
+            sessions = self._online.get(username)
+            if not sessions:
+                sessions = self._online[username] = [
+                    {"session_id": str(1000 + i), "session_ip": f"172.27.{i}.{10 + i}", "ras_ip": "172.26.0.1",
+                     "session_start_time": f"2025-08-01 0{i}:00:00"}
+                    for i in range(3)
+                ]
+            return list(sessions)
+
+    def _disconnect(self, username, session_id):
+        with self._lock:
+            sessions = self._online.get(username, [])
+            if sessions and sessions[0]["session_id"] == session_id:  # the session whose IP the portal reports
+                self.connected.discard(username)
+            self._online[username] = [s for s in sessions if s["session_id"] != session_id]
+            return len(sessions) != len(self._online[username])
+
+    def _handler(self):
+        portal = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _cookies(self):
+                return {k: m.value for k, m in SimpleCookie(self.headers.get("Cookie", "")).items()}
+
+            def _form(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+
+            def _send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=()):
+                if isinstance(body, str):
+                    body = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+                with portal._lock:
+                    portal.bytes_sent += len(body)
+
+            def _redirect(self, location, headers=()):
+                self._send(302, b"", headers=[("Location", location), *headers])
+
+            def _begin(self):
+                path = urlparse(self.path).path
+                with portal._lock:
+                    portal.requests[f"{self.command} {path}"] += 1
+                if portal.latency:
+                    time.sleep(portal.latency)
+                if portal.failure_rate and portal.random.random() < portal.failure_rate:
+                    self._send(500, "Injected failure")
+                    return None
+                return path
+
+            def do_GET(self):
+                path = self._begin()
+                if path is None:
+                    return
+                query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                cookies = self._cookies()
+                net_user = portal._user("net", cookies.get("sessionid"))
+
+                if path == "/en-us/user/login/":
+                    token = cookies.get("csrftoken") or secrets.token_hex(16)
+                    self._send(200, LOGIN_FORM.format(token=token), headers=[
+                        ("Set-Cookie", f"csrftoken={token}; Path=/")])
+                elif path == "/en-us/user/home/":
+                    if net_user is None:
+                        self._redirect("/en-us/user/login/")
+                    else:
+                        self._send(200, HOME_PAGE.format(username=net_user, padding=portal.padding))
+                elif path == "/en-us/user/get_user_online_session/":
+                    if net_user is None:
+                        self._redirect("/en-us/user/login/")
+                    else:
+                        sessions = portal.online_sessions(net_user)
+                        payload = {"result": [sessions], "ip": sessions[0]["session_ip"] if sessions else "0.0.0.0"}
+                        self._send(200, json.dumps(payload), content_type="application/json")
+                elif path == "/en-us/user/disconnect/":
+                    if net_user is None:
+                        self._redirect("/en-us/user/login/")
+                    else:
+                        portal._disconnect(net_user, query.get("u_id"))
+                        self._send(200, json.dumps({"result": "ok"}), content_type="application/json")
+                elif path == "/cas/login":
+                    self._send(200, CAS_FORM.format(execution=secrets.token_hex(32)))
+                elif path == "/profile":
+                    if portal._user("cas", cookies.get("CASTGC")) is None:
+                        self._send(200, CAS_FORM.format(execution=secrets.token_hex(32)))
+                    else:
+                        self._send(200, profile_page(portal.padding))
+                elif path == "/login":
+                    self._send(200, BW_LOGIN_FORM)
+                elif path == "/":
+                    self._send(200, HOME_PAGE.format(username="bw", padding=portal.padding))
+                elif path == "/connections":
+                    if portal._user("bw", cookies.get("bw_session")) is None:
+                        self._redirect("/login")
+                    else:
+                        self._send(200, portal._connections_page)
+                elif path == "/ip":
+                    # Stand-in for the public "what is my IP" services
+                    self._send(200, self.client_address[0], content_type="text/plain")
+                else:
+                    self._send(404, "Not found")
+
+            def do_POST(self):
+                path = self._begin()
+                if path is None:
+                    return
+                form = self._form()
+                cookies = self._cookies()
+
+                if path == "/en-us/user/login/":
+                    if not form.get("username") or form.get("csrfmiddlewaretoken") != cookies.get("csrftoken"):
+                        self._send(403, "CSRF verification failed")
+                        return
+                    token = portal._login("net", form["username"])
+                    self._redirect("/en-us/user/home/", headers=[("Set-Cookie", f"sessionid={token}; Path=/")])
+                elif path == "/en-us/user/aaa_ras_connect/":
+                    net_user = portal._user("net", cookies.get("sessionid"))
+                    if net_user is None:
+                        self._send(403, "Forbidden")
+                    elif self.headers.get("X-CSRFToken") != cookies.get("csrftoken"):
+                        self._send(403, "CSRF verification failed")
+                    else:
+                        with portal._lock:
+                            portal.connected.add(net_user)
+                        self._send(200, json.dumps({"result": "connected"}), content_type="application/json")
+                elif path == "/cas/login":
+                    if not form.get("username") or not form.get("execution"):
+                        self._send(200, CAS_FORM.format(execution=secrets.token_hex(32)))
+                        return
+                    if form.get("password") == WRONG_PASSWORD:
+                        self._send(401, CAS_FORM.format(execution=secrets.token_hex(32)))
+                        return
+                    token = portal._login("cas", form["username"])
+                    self._send(200, "<html><body>Logged in</body></html>",
+                               headers=[("Set-Cookie", f"CASTGC={token}; Path=/")])
+                elif path == "/login":
+                    if not form.get("normal_username") or form.get("normal_password") == WRONG_PASSWORD:
+                        self._send(200, BW_LOGIN_FORM)
+                        return
+                    token = portal._login("bw", form["normal_username"])
+                    self._redirect("/", headers=[("Set-Cookie", f"bw_session={token}; Path=/")])
+                else:
+                    self._send(404, "Not found")
+
+        return Handler
+
+
+def point_at(base_url, cookie_store=None):
+    """Send every api module to the mock portal at base_url instead of the university servers.
+
+    The session pools get cookie_store (default: none), so the mock's cookies never reach the user's store.
+    """
+    from api.connection import inside, ip_resolver
+    from api.metadata import connections_logs, profile
+
+    inside.origin = base_url
+    inside.cookie_domain = urlparse(base_url).hostname
+    inside.login_url = f"{base_url}/en-us/user/login/"
+    inside.home_url = f"{base_url}/en-us/user/home/"
+    inside.connect_url = f"{base_url}/en-us/user/aaa_ras_connect/"
+    inside.sessions_url = f"{base_url}/en-us/user/get_user_online_session/"
+    inside.disconnect_url = f"{base_url}/en-us/user/disconnect/"
+    profile.LOGIN_URL = f"{base_url}/cas/login"
+    profile.USER_URL = f"{base_url}/profile"
+    connections_logs.BW_LOGIN_URL = f"{base_url}/login"
+    connections_logs.BW_LOGS_URL = f"{base_url}/connections"
+    ip_resolver.IP_SOURCES = [f"{base_url}/ip"]  # resolvers created from now on
+    for pool in (inside.session_pool, profile.cas_pool, connections_logs.bw_pool):
+        pool.cookie_store = cookie_store
+        pool.invalidate()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the mock Sharif portals")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument("--rows", type=int, default=2000, help="rows in the bandwidth csvtable")
+    parser.add_argument("--session-ttl", type=float, default=None, help="seconds before a login expires")
+    args = parser.parse_args()
+
+    mock = MockPortal(port=args.port, latency=args.latency, failure_rate=args.failure_rate, rows=args.rows,
+                      session_ttl=args.session_ttl)
+    print(f"Mock portals listening on {mock.url}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        mock.stop()
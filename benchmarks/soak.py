@@ -0,0 +1,346 @@
+"""
+Soak test: run SharifConnectAPI through connect -> sessions -> logs -> disconnect cycles against the mock
+portal and the fake VPN backend, and fail if memory, file descriptors, sockets or threads keep growing.
+
+    python -m benchmarks.soak --cycles 1000 --sample-every 50 --path both
+
+Everything stays local. With --path vpn the probes see a DNS responder that answers only while the fake VPN
+is up and closed ports for the portal and the internet, so a cycle goes outside (state 0) -> VPN (1) ->
+outside (0). With --path inside the DNS responder always answers, the portal probe reaches the mock portal
+and the internet probe reaches a local TLS responder (self-signed, trusted by the probe) that completes the
+handshake only while the mock's RAS link is up, so a cycle logs in through the portal: inside without
+internet (3) -> inside with internet (2) -> 3. --path both (the default) alternates the two.
+Config, logs and the usage database go to a throwaway directory, not the user's.
+RSS, FDs and sockets come from psutil when it is installed, else from /proc (Linux).
+"""
+import os
+import tempfile
+
+# Before anything imports api.configurations, which creates the config directory under the home folder
+_HOME = tempfile.mkdtemp(prefix="sharif-soak-")
+os.environ["HOME"] = os.environ["APPDATA"] = _HOME
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import datetime
+import ipaddress
+import socket
+import ssl
+import statistics
+import threading
+import time
+import tracemalloc
+from urllib.parse import urlsplit
+
+from benchmarks.mock_portal import MockPortal, point_at
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+USERNAME = "soak"
+PASSWORD = "secret"
+
+# Growth from the baseline (taken after the warm-up cycles) to the end that fails the run
+THRESHOLDS = {
+    'rss_mb': 25.0,
+    'heap_mb': 5.0,
+    'fds': 10,
+    'sockets': 10,
+    'threads': 5,
+}
+
+
+class DnsResponder:
+    """UDP stand-in for the Sharif DNS servers: answers the probe's query only while is_up() is true.
+
+    When down it replies with a different query id, which the probe treats as unreachable without waiting
+    for its timeout.
+    """
+
+    def __init__(self, is_up):
+        self.is_up = is_up
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._serve, name="dns-responder", daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                data, address = self.sock.recvfrom(512)
+            except OSError:
+                return
+            if not self.is_up():
+                data = bytes([data[0] ^ 0xFF]) + data[1:]
+            self.sock.sendto(data, address)
+
+    def close(self):
+        self.sock.close()
+
+
+class TlsResponder:
+    """TLS stand-in for the internet hosts: completes the handshake only while is_up() is true.
+
+    When down it closes each connection before the handshake, like a host behind a link that is not up.
+    `client_context` trusts its self-signed certificate for 127.0.0.1, so the probe still verifies it.
+    """
+
+    def __init__(self, is_up, directory):
+        self.is_up = is_up
+        cert, key = self_signed_cert(directory)
+        self.server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.server_context.load_cert_chain(cert, key)
+        self.client_context = ssl.create_default_context(cafile=cert)
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._serve, name="tls-responder", daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            with conn:
+                if not self.is_up():
+                    continue
+                conn.settimeout(2)
+                try:
+                    with self.server_context.wrap_socket(conn, server_side=True):
+                        pass
+                except OSError:
+                    continue
+
+    def close(self):
+        self.sock.close()
+
+
+def self_signed_cert(directory):
+    """Write a certificate and key for 127.0.0.1 into directory; returns their paths."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=30))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]),
+                       critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = os.path.join(directory, "soak-cert.pem")
+    key_path = os.path.join(directory, "soak-key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+def closed_port():
+    """A local port nothing listens on, so TCP probes to it are refused at once."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalNetwork:
+    """Where the connection probes think this machine is: 'outside' or 'inside' the university network.
+
+    Outside, Sharif is reachable only while the fake VPN is up. Inside, the portal answers and the internet
+    is reachable only while the mock portal has the user's link up.
+    """
+
+    def __init__(self, vpn, mock):
+        from api.connection import network
+
+        self.network = network
+        self.vpn = vpn
+        self.mock = mock
+        self.place = 'outside'
+        self.dns = DnsResponder(lambda: self.place == 'inside' or vpn.connected)
+        self.internet = TlsResponder(lambda: self.place == 'inside' and USERNAME in mock.connected, _HOME)
+        self._closed_port = closed_port()
+        self._portal_port = urlsplit(mock.url).port
+        network.SHARIF_DNS_SERVERS = ["127.0.0.1"]
+        network.DNS_PORT = self.dns.port
+        network.INTERNET_HOSTS = [("127.0.0.1", self.internet.port)]
+        network._tls_context = self.internet.client_context
+        self.move('outside')
+
+    def move(self, place):
+        self.place = place
+        self.network.PORTAL_HOST = ("127.0.0.1", self._portal_port if place == 'inside' else self._closed_port)
+
+    def close(self):
+        self.dns.close()
+        self.internet.close()
+
+
+def process_counts():
+    """(RSS in MB, open FDs/handles, open sockets); None for what this platform can't tell."""
+    if psutil is not None:
+        process = psutil.Process()
+        fds = process.num_fds() if hasattr(process, "num_fds") else process.num_handles()
+        connections = getattr(process, "net_connections", None) or process.connections
+        return process.memory_info().rss / 2 ** 20, fds, len(connections(kind="all"))
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+        links = []
+        for fd in os.listdir("/proc/self/fd"):
+            try:
+                links.append(os.readlink(f"/proc/self/fd/{fd}"))
+            except OSError:
+                continue
+        return rss, len(links), sum(1 for link in links if link.startswith("socket:"))
+    except OSError:
+        return None, None, None
+
+
+def sample(cycle):
+    gc.collect()
+    rss, fds, sockets = process_counts()
+    heap, _ = tracemalloc.get_traced_memory()
+    return {
+        'cycle': cycle,
+        'time': round(time.time(), 1),
+        'rss_mb': round(rss, 2) if rss is not None else None,
+        'heap_mb': round(heap / 2 ** 20, 3),
+        'fds': fds,
+        'sockets': sockets,
+        'threads': threading.active_count(),
+    }
+
+
+def run_cycle(api):
+    """One user-like round; returns the names of the calls that failed."""
+    with contextlib.redirect_stdout(io.StringIO()):  # sessions() prints the portal's answer
+        results = {
+            'connect': api.connect(),
+            'sessions': api.sessions(),
+            'logs': api.get_logs(),
+            'disconnect': api.disconnect(),
+        }
+    return [name for name, result in results.items() if not (result.get('success') or result.get('result') is True)]
+
+
+def top_allocators(snapshot, baseline, limit):
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+    stats = snapshot.filter_traces(filters).compare_to(baseline.filter_traces(filters), "lineno")
+    return [
+        {'where': str(stat.traceback[0]), 'growth_kb': round(stat.size_diff / 1024, 1), 'count_diff': stat.count_diff}
+        for stat in stats[:limit] if stat.size_diff > 0
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soak-test connect/disconnect cycles for memory and handle leaks")
+    parser.add_argument("--cycles", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=60,
+                        help="cycles before the baseline sample, long enough to fill the bounded job and dial histories")
+    parser.add_argument("--sample-every", type=int, default=20)
+    parser.add_argument("--vpn-latency", type=float, default=0.01, help="seconds per fake VPN dial")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the mock portal adds to every response")
+    parser.add_argument("--rows", type=int, default=200, help="rows in the mock bandwidth table")
+    parser.add_argument("--path", choices=("vpn", "inside", "both"), default="both",
+                        help="connect over the fake VPN (state 1), through the portal login (state 3), or alternate")
+    parser.add_argument("--top", type=int, default=10, help="allocation sites to report")
+    for name, limit in THRESHOLDS.items():
+        parser.add_argument(f"--max-{name.replace('_', '-')}", type=float, default=limit, dest=f"max_{name}",
+                            help=f"allowed growth of {name} after the warm-up (default {limit})")
+    parser.add_argument("--output", help="write samples and the verdict as JSON to this file")
+    args = parser.parse_args(argv)
+    if args.cycles <= args.warmup:
+        parser.error("--cycles must be larger than --warmup")
+
+    from api.configurations import flush_log
+    from api.connection.vpn import FakeVpnBackend, set_backend
+    from api.sharif_api import SharifConnectAPI
+
+    tracemalloc.start()
+    vpn = set_backend(FakeVpnBackend(latency=args.vpn_latency, profile_latency=args.vpn_latency))
+    places = {'vpn': ['outside'], 'inside': ['inside'], 'both': ['outside', 'inside']}[args.path]
+    samples = []
+    failures = {}
+    cycle_ms = []
+    with MockPortal(latency=args.latency, rows=args.rows) as mock:
+        point_at(mock.url)
+        local = LocalNetwork(vpn, mock)
+        api = SharifConnectAPI()
+        api.login(USERNAME, PASSWORD, False, save=False)
+        samples.append(sample(0))
+        baseline = baseline_snapshot = None
+        print(f"{'cycle':>6} {'rss MB':>8} {'heap MB':>8} {'fds':>5} {'socks':>5} {'thr':>4}  failed")
+        for cycle in range(1, args.cycles + 1):
+            local.move(places[cycle % len(places)])
+            started = time.perf_counter()
+            for name in run_cycle(api):
+                name = f"{local.place}:{name}"
+                failures[name] = failures.get(name, 0) + 1
+            cycle_ms.append((time.perf_counter() - started) * 1000)
+            if cycle == args.warmup:
+                baseline = sample(cycle)
+                baseline_snapshot = tracemalloc.take_snapshot()
+                samples.append(baseline)
+            elif cycle % args.sample_every == 0 or cycle == args.cycles:
+                samples.append(sample(cycle))
+            else:
+                continue
+            s = samples[-1]
+            print(f"{cycle:6} {s['rss_mb'] or '-':>8} {s['heap_mb']:>8} {s['fds'] or '-':>5} {s['sockets'] or '-':>5} "
+                  f"{s['threads']:>4}  {sum(failures.values())}")
+        api.logout()
+        final_snapshot = tracemalloc.take_snapshot()
+        local.close()
+    final = samples[-1]
+
+    growth = {name: round(final[name] - baseline[name], 3) for name in THRESHOLDS
+              if final[name] is not None and baseline[name] is not None}
+    exceeded = {name: value for name, value in growth.items() if value > getattr(args, f"max_{name}")}
+    report = {
+        'cycles': args.cycles,
+        'path': args.path,
+        'failed_calls': failures,
+        'cycle_ms': {'p50': round(statistics.median(cycle_ms), 1), 'max': round(max(cycle_ms), 1)},
+        'growth_after_warmup': growth,
+        'exceeded': exceeded,
+        'top_allocators': top_allocators(final_snapshot, baseline_snapshot, args.top),
+        'samples': samples,
+    }
+    tracemalloc.stop()
+    flush_log()
+
+    print(f"\ncycle p50 {report['cycle_ms']['p50']} ms, failed calls {failures or 'none'}")
+    print("growth after warm-up: " + ", ".join(f"{name} {value:+g}" for name, value in growth.items()))
+    print("top allocation growth:")
+    for entry in report['top_allocators']:
+        print(f"  {entry['growth_kb']:+9.1f} KB {entry['count_diff']:+6d}  {entry['where']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if exceeded:
+        print("FAIL: " + ", ".join(f"{name} grew {value:+g} (max {getattr(args, f'max_{name}'):g})"
+                                   for name, value in exceeded.items()))
+        return 1
+    print("PASS")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
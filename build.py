@@ -0,0 +1,115 @@
+"""
+Build dist/static: the UI with precompiled, purged Tailwind CSS instead of the in-browser Tailwind runtime,
+and the page/menu HTML inlined into one script.
+
+    python build.py                                    # Tailwind v3 CLI through npx
+    python build.py --tailwind ./tailwindcss-windows-x64.exe
+
+The standalone Tailwind binary works as well as npx (no Node.js needed). The PyInstaller command in README.md
+bundles dist/static as the packaged app's static/; from a checkout, main.py serves it only with
+SHARIF_CONNECT_DIST=1.
+"""
+import argparse
+import json
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+SOURCE = ROOT / "static"
+DIST = ROOT / "dist" / "static"
+TAILWIND_CONFIG = ROOT / "tailwind.config.js"
+DEFAULT_TAILWIND = "npx --yes tailwindcss@3.4.17"  # the version of the runtime it replaces
+CSS_BANNER = "tailwindcss v3"  # in the license comment the v3 CLI puts at the top of its output
+
+RUNTIME = "js/tailwindcss.js"
+CSS = "css/tailwind.css"
+BUNDLE = "js/bundle.js"
+BUNDLED = ("pages/*.html", "components/*.html")  # fetched by Utils.loadHTML
+
+# The runtime and its inline config in static/index.html
+RUNTIME_TAGS = re.compile(r'\s*<script src="js/tailwindcss\.js"></script>\s*<script>\s*tailwind\.config = .*?</script>',
+                          re.S)
+
+
+def copy_static():
+    shutil.rmtree(DIST, ignore_errors=True)
+    shutil.copytree(SOURCE, DIST, ignore=lambda folder, names: [
+        name for name in names if Path(folder, name) == SOURCE / RUNTIME])
+
+
+def build_css(tailwind):
+    """Compile only the utility classes the pages, the menu and the scripts use."""
+    with tempfile.TemporaryDirectory() as temp:
+        source = Path(temp) / "input.css"
+        source.write_text("@tailwind base;\n@tailwind components;\n@tailwind utilities;\n")
+        command = shlex.split(tailwind, posix=os.name != "nt")
+        command[0] = shutil.which(command[0]) or command[0]
+        subprocess.run(command + ["-c", str(TAILWIND_CONFIG), "-i", str(source), "-o", str(DIST / CSS),
+                                  "--minify"], cwd=ROOT, check=True)
+    css = DIST / CSS
+    if not css.exists() or CSS_BANNER not in css.read_text(encoding="utf-8", errors="replace")[:200]:
+        raise OSError(f"{CSS} was not written by the Tailwind v3 CLI")
+
+
+def build_bundle():
+    """Inline the page/menu HTML as window.STATIC_BUNDLE, so navigating reads no files."""
+    files = {
+        path.relative_to(SOURCE).as_posix(): path.read_text(encoding="utf-8")
+        for pattern in BUNDLED for path in sorted(SOURCE.glob(pattern))
+    }
+    (DIST / BUNDLE).write_text(
+        "// Generated by build.py from static/pages and static/components, do not edit\n"
+        f"window.STATIC_BUNDLE = {json.dumps(files, ensure_ascii=False, separators=(',', ':'))}\n",
+        encoding="utf-8")
+    # Read by the API at startup; compact, like the rest of the build
+    languages = json.loads((SOURCE / "lang" / "languages.json").read_text(encoding="utf-8"))
+    (DIST / "lang" / "languages.json").write_text(json.dumps(languages, ensure_ascii=False, separators=(',', ':')),
+                                                  encoding="utf-8")
+    return len(files)
+
+
+def build_index():
+    """Swap the runtime for the compiled CSS and load the bundle before the app."""
+    html = (SOURCE / "index.html").read_text(encoding="utf-8")
+    html, replaced = RUNTIME_TAGS.subn(f'\n    <link rel="stylesheet" href="{CSS}">', html)
+    if replaced != 1:
+        raise SystemExit("static/index.html: the Tailwind runtime tags were not found, update build.py")
+    html = html.replace('<script type="module" src="js/app.js"></script>',
+                        f'<script src="{BUNDLE}"></script>\n    <script type="module" src="js/app.js"></script>')
+    (DIST / "index.html").write_text(html, encoding="utf-8")
+
+
+def size(path):
+    return f"{path.stat().st_size / 1024:.1f} KB"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build dist/static with precompiled CSS")
+    parser.add_argument("--tailwind", default=os.getenv("TAILWIND", DEFAULT_TAILWIND),
+                        help=f"Tailwind v3 CLI command (default: {DEFAULT_TAILWIND}, or $TAILWIND)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    copy_static()
+    try:
+        build_css(args.tailwind)
+    except (OSError, subprocess.CalledProcessError) as e:
+        shutil.rmtree(DIST, ignore_errors=True)  # a dist without CSS must not be bundled or served
+        raise SystemExit(f"Tailwind CLI failed ({e}); install Node.js or pass --tailwind PATH_TO_STANDALONE_BINARY")
+    pages = build_bundle()
+    build_index()
+    print(f"Built {DIST.relative_to(ROOT)} in {time.perf_counter() - started:.1f}s")
+    print(f"  {CSS}: {size(DIST / CSS)} (runtime it replaces: {size(SOURCE / RUNTIME)})")
+    print(f"  {BUNDLE}: {size(DIST / BUNDLE)}, {pages} files inlined")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
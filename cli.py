@@ -0,0 +1,383 @@
+"""
+Headless entry point: the connect/sessions/usage logic of the app without the pywebview window.
+
+    python cli.py status
+    python cli.py -u USER connect
+    python cli.py kill-session others
+    python cli.py daemon            # state monitor + auto-reconnect + local control socket
+    python cli.py ctl status        # ask a running daemon
+    python cli.py audit accounts.csv --older-than 12h [--kill]
+
+Credentials come from -u/-p, then SHARIF_CONNECT_USERNAME/SHARIF_CONNECT_PASSWORD, then the login the GUI
+remembered. Nothing here imports webview or any other GUI package.
+"""
+from api import startup  # first import: starts the startup clock
+
+import argparse
+import getpass
+import json
+import os
+import secrets
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from api.configurations import CONFIG_FILE, flush_log, log_event
+from api.sharif_api import SharifConnectAPI
+
+startup.mark('imports')
+
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8767
+DAEMON_FILE = CONFIG_FILE.with_name("daemon.json")  # port and token of the running daemon, readable by its user only
+CONTROL_TIMEOUT = 90  # seconds a control client waits for an answer (a VPN dial can take a minute)
+
+STATE_NAMES = {
+    -1: "unknown",
+    0: "outside, not connected",
+    1: "connected (VPN)",
+    2: "connected (inside)",
+    3: "inside, not logged in to the portal",
+}
+
+
+def format_bytes(size):
+    size = float(size or 0)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def credentials(args, api):
+    """Pick the username and password from the flags, the environment or the remembered login."""
+    saved = api.config_data()
+    username = args.username or os.getenv("SHARIF_CONNECT_USERNAME") or saved.get("username", "")
+    password = args.password or os.getenv("SHARIF_CONNECT_PASSWORD")
+    if not password and username == saved.get("username"):
+        password = saved.get("password", "")
+    if username and not password and sys.stdin.isatty():
+        password = getpass.getpass(f"Password for {username}: ")
+    return username, password
+
+
+def login(args, api, watch=False):
+    """Log the API in; watch starts the state monitor and auto-reconnect (the daemon only)."""
+    username, password = credentials(args, api)
+    # Only --remember touches the saved login, so scripting with other credentials leaves the app's alone
+    result = api.login(username, password, args.remember or api.remember_me, save=args.remember, watch=watch)
+    if not result['success']:
+        raise SystemExit("No credentials: pass -u/-p, set SHARIF_CONNECT_USERNAME/PASSWORD or log in once in the app")
+
+
+def run_job(api, name, echo=None):
+    """Run a connect/disconnect job to the end, handing each progress event to echo."""
+    started = api.start_job(name)
+    if not started['success']:
+        return started
+    seen = 0
+    while True:
+        status = api.job_status(started['job_id'], seen)
+        for event in status['events']:
+            if echo:
+                echo(event)
+        seen += len(status['events'])
+        if status['status'] not in ('pending', 'running'):
+            break
+        time.sleep(0.2)
+    if status['status'] == 'done':
+        return status['result']
+    return {'success': False, 'message': status['error'] or status['status']}
+
+
+def do_status(api, params, echo=None):
+    state = api.update_state()
+    ip = api.current_ip(wait=True)
+    return {'success': True, 'state': state, 'state_name': STATE_NAMES.get(state, str(state)),
+            'ip': ip.get('ip'), 'probe': api.probe_report()}
+
+
+def do_connect(api, params, echo=None):
+    return run_job(api, 'connect', echo)
+
+
+def do_disconnect(api, params, echo=None):
+    return run_job(api, 'disconnect', echo)
+
+
+def do_sessions(api, params, echo=None):
+    response = api.sessions()
+    if response['result'] is not True:
+        return {'success': False, 'message': response['data']}
+    return {'success': True, 'ip': response['data'].get('ip'), 'sessions': response['data'].get('result', [[]])[0]}
+
+
+def do_kill_session(api, params, echo=None):
+    target = params.get('session')
+    if target == 'others':
+        return api.disconnect_other_sessions()
+    listed = do_sessions(api, {})
+    if not listed['success']:
+        return listed
+    matches = [s for s in listed['sessions'] if target in (str(s.get('session_id')), s.get('session_ip'))]
+    if not matches:
+        return {'success': False, 'message': f"No online session with id or IP {target}"}
+    return api.disconnect_sessions(matches)
+
+
+def do_usage(api, params, echo=None):
+    if not params.get('offline'):
+        synced = api.sync_usage()
+        if not synced['success'] and echo:
+            echo({'step': 'sync', 'message': synced['message']})
+    return api.usage_summary()
+
+
+def do_stats(api, params, echo=None):
+    return {'success': True, 'reconnect': api.reconnect_stats(), 'sessions': api.session_stats(),
+            'transport': api.transport_stats(), 'ip': api.ip_report(), 'vpn': api.vpn_report(),
+            'warmup': api.warmup_report()}
+
+
+COMMANDS = {
+    'status': do_status,
+    'connect': do_connect,
+    'disconnect': do_disconnect,
+    'sessions': do_sessions,
+    'kill-session': do_kill_session,
+    'usage': do_usage,
+    'stats': do_stats,
+}
+
+
+def print_result(command, result, as_json=False):
+    if as_json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+    if command == 'kill-session' and 'results' in result:
+        for item in result['results']:
+            print(f"{item['session_id']} ({item['session_ip']}): {'disconnected' if item['success'] else item['message']}")
+        if not result['results']:
+            print("Nothing to disconnect")
+    elif not result.get('success'):
+        print(f"Error: {result.get('message') or result.get('messages') or result.get('massage') or result}")
+    elif command == 'status':
+        print(f"State: {result['state_name']}")
+        if result['ip']:
+            print(f"IP:    {result['ip']}")
+    elif command == 'sessions':
+        for session in result['sessions']:
+            current = "  (this machine)" if session.get('session_ip') == result['ip'] else ""
+            print(f"{session.get('session_id')}  {session.get('session_ip') or '-':15}  "
+                  f"{session.get('session_start_time') or '-'}{current}")
+        if not result['sessions']:
+            print("No online sessions")
+    elif command == 'usage':
+        for period in ('today', 'week', 'month'):
+            totals = result['data'][period]
+            print(f"{period:6} down {format_bytes(totals['download']):>10}  up {format_bytes(totals['upload']):>10}  "
+                  f"total {format_bytes(totals['total']):>10}")
+    elif command in ('connect', 'disconnect'):
+        print(result.get('message', 'Done') + (f" ({result['ip']})" if result.get('ip') else ""))
+    else:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+def echo_event(event):
+    print(f"... {event['step']}" + (f": {event['message']}" if event.get('message') else ""), file=sys.stderr)
+
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    """One JSON request per line: {"token": ..., "command": ..., "params": {...}} -> one JSON line back."""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                self.reply({'success': False, 'message': 'Invalid JSON'})
+                continue
+            if not secrets.compare_digest(str(request.get('token', '')), self.server.token):
+                self.reply({'success': False, 'message': 'Invalid token'})
+                return
+            command = COMMANDS.get(request.get('command'))
+            if command is None:
+                self.reply({'success': False, 'message': f"Unknown command: {request.get('command')}"})
+                continue
+            try:
+                self.reply(command(self.server.api, request.get('params') or {}))
+            except Exception as e:
+                log_event(f"Control command {request.get('command')} failed: {e}")
+                self.reply({'success': False, 'message': str(e)})
+
+    def reply(self, result):
+        self.wfile.write(json.dumps(result, ensure_ascii=False).encode() + b"\n")
+
+
+class ControlServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, api):
+        super().__init__(address, ControlHandler)
+        self.api = api
+        self.token = secrets.token_urlsafe(24)
+
+
+def write_daemon_file(host, port, token):
+    temp = DAEMON_FILE.with_suffix(".tmp")
+    fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'host': host, 'port': port, 'token': token, 'pid': os.getpid()}, f)
+    os.replace(temp, DAEMON_FILE)
+
+
+def run_daemon(args, api):
+    login(args, api, watch=True)
+    server = ControlServer((args.host, args.port), api)
+    host, port = server.server_address[:2]
+
+    def on_state_change(old_state, new_state):
+        print(f"{time.strftime('%H:%M:%S')} {STATE_NAMES.get(new_state, new_state)}", flush=True)
+
+    api._monitor.add_listener(on_state_change)
+    stopping = threading.Event()
+
+    def stop(signum=None, frame=None):
+        if not stopping.is_set():
+            stopping.set()
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    log_event(f"Daemon listening on {host}:{port}", auto_connect=api.get_settings()['auto_connect'])
+    print(f"Listening on {host}:{port} (auto_connect {'on' if api.get_settings()['auto_connect'] else 'off'})",
+          flush=True)
+    write_daemon_file(host, port, server.token)
+    try:
+        server.serve_forever(poll_interval=0.5)
+    finally:
+        server.server_close()
+        try:
+            DAEMON_FILE.unlink()
+        except OSError:
+            pass
+        log_event("Daemon stopped")
+        flush_log()
+
+
+def run_audit(args):
+    """Audit the sessions of every account in a username,password CSV; this needs no login of its own."""
+    from api.connection.audit import KillRules, SessionAuditor, load_credentials, parse_duration, write_report
+
+    rules = KillRules(older_than=parse_duration(args.older_than) if args.older_than else None,
+                      keep_newest=args.keep_newest, ras_ips=args.ras_ip or ())
+    if args.kill and not rules:
+        raise SystemExit("--kill needs a rule: --older-than, --keep-newest or --ras-ip")
+    limits = {'concurrency': args.concurrency, 'rate': args.rate, 'burst': args.burst}
+    auditor = SessionAuditor(**{name: value for name, value in limits.items() if value is not None})
+    result = auditor.audit(load_credentials(args.credentials), rules, kill=args.kill)
+    if args.report:
+        write_report(result['rows'], args.report)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        for row in result['rows']:
+            print(f"{row['account']:20} {row['ras_ip'] or '-':15} {row['session_ip'] or '-':15} "
+                  f"{row['session_id']}  {row['session_start_time'] or '-'}")
+        for error in result['errors']:
+            print(f"{error['account']:20} error: {error['error']}")
+        for row in result['killed'] if args.kill else result['stale']:
+            outcome = ('disconnected' if row['success'] else row['message']) if args.kill else 'would disconnect'
+            print(f"{row['account']:20} {row['session_id']}: {outcome} ({row['reason']})")
+        summary = result['summary']
+        print(f"{summary['accounts']} accounts ({summary['failed_accounts']} failed), {summary['sessions']} sessions, "
+              f"{summary['stale']} stale, {summary['killed']} disconnected; {summary['logins']} logins, "
+              f"{summary['reused_logins']} reused; {summary['wall_ms'] / 1000:.1f}s")
+    flush_log()
+    return 1 if result['errors'] or any(not row['success'] for row in result['killed']) else 0
+
+
+def control(command, params):
+    """Send one command to the running daemon and return its answer."""
+    try:
+        info = json.loads(DAEMON_FILE.read_text())
+    except (OSError, ValueError):
+        raise SystemExit("No daemon is running (start one with: python cli.py daemon)")
+    request = {'token': info['token'], 'command': command, 'params': params}
+    try:
+        with socket.create_connection((info['host'], info['port']), timeout=CONTROL_TIMEOUT) as sock:
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            answer = sock.makefile('rb').readline()
+    except OSError as e:
+        raise SystemExit(f"Cannot reach the daemon on {info['host']}:{info['port']}: {e}")
+    return json.loads(answer) if answer else {'success': False, 'message': 'The daemon closed the connection'}
+
+
+def add_command_parsers(subparsers):
+    subparsers.add_parser('status', help="show the connection state and public IP")
+    subparsers.add_parser('connect', help="log in to the portal (inside) or dial the VPN (outside)")
+    subparsers.add_parser('disconnect', help="end the current connection")
+    subparsers.add_parser('sessions', help="list the online sessions of the account")
+    kill = subparsers.add_parser('kill-session', help="disconnect an online session")
+    kill.add_argument('session', help="session id, session IP, or 'others' for every session but this machine's")
+    usage = subparsers.add_parser('usage', help="today/week/month traffic from the local usage store")
+    usage.add_argument('--offline', action='store_true', help="don't sync new rows from the portal first")
+    subparsers.add_parser('stats', help="reconnect, session pool, transport, IP lookup and VPN dial counters")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Sharif Connect without the GUI")
+    parser.add_argument('-u', '--username')
+    parser.add_argument('-p', '--password', help="better: SHARIF_CONNECT_PASSWORD, or the prompt")
+    parser.add_argument('--remember', action='store_true', help="save these credentials like the app's remember me")
+    parser.add_argument('--json', action='store_true', help="print the raw result as JSON")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    add_command_parsers(subparsers)
+    daemon = subparsers.add_parser('daemon', help="keep running: state monitor, auto-reconnect, control socket")
+    daemon.add_argument('--host', default=DAEMON_HOST)
+    daemon.add_argument('--port', type=int, default=DAEMON_PORT, help="0 picks a free port")
+    audit = subparsers.add_parser('audit', help="list (and clean up) the online sessions of many accounts")
+    audit.add_argument('credentials', help="CSV file of username,password rows")
+    audit.add_argument('--concurrency', type=int, help="accounts worked on at once (default 8)")
+    audit.add_argument('--rate', type=float, help="requests per second to the portal (default 5, 0: no limit)")
+    audit.add_argument('--burst', type=int, help="requests let through at once before the rate applies (default 10)")
+    audit.add_argument('--older-than', help="stale: started longer ago than this (e.g. 12h, 2d)")
+    audit.add_argument('--keep-newest', type=int, help="stale: all but the newest N sessions of an account")
+    audit.add_argument('--ras-ip', action='append', help="stale: sessions on this RAS server (repeatable)")
+    audit.add_argument('--kill', action='store_true', help="disconnect the stale sessions (default: only list them)")
+    audit.add_argument('--report', help="also write the sessions to this CSV file")
+    ctl = subparsers.add_parser('ctl', help="send a command to the running daemon")
+    add_command_parsers(ctl.add_subparsers(dest='ctl_command', required=True))
+    return parser
+
+
+def command_params(args):
+    return {key: value for key, value in vars(args).items() if key in ('session', 'offline')}
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'ctl':
+        result = control(args.ctl_command, command_params(args))
+        print_result(args.ctl_command, result, args.json)
+        return 0 if result.get('success') else 1
+    if args.command == 'audit':
+        return run_audit(args)
+    api = SharifConnectAPI()
+    if args.command == 'daemon':
+        run_daemon(args, api)
+        return 0
+    login(args, api)
+    result = COMMANDS[args.command](api, command_params(args), None if args.json else echo_event)
+    print_result(args.command, result, args.json)
+    flush_log()
+    return 0 if result.get('success') else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
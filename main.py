@@ -1,10 +1,15 @@
+from api import startup  # first import: starts the startup clock
+
 import webview
 import os
+import sys
 from pathlib import Path
 
 # Import your existing API class
 from api.sharif_api import SharifConnectAPI
 
+startup.mark('imports')
+
 class Api:
     def load_page(self, page_name):
         """Load a specific page"""
@@ -15,10 +20,14 @@ if __name__ == '__main__':
     # Create API instances
     api = Api()
     sharif_api = SharifConnectAPI()
+    startup.mark('api_created')
     
-    # Get absolute path to HTML file
+    # Get absolute path to HTML file. The packaged app bundles the output of build.py as its static/; from a
+    # checkout, static/ is served so edits show up, and SHARIF_CONNECT_DIST=1 serves dist/static to try a build
     current_dir = Path(__file__).parent
     html_file = current_dir / 'static' / 'index.html'
+    if not getattr(sys, 'frozen', False) and os.getenv('SHARIF_CONNECT_DIST') == '1':
+        html_file = current_dir / 'dist' / 'static' / 'index.html'
     
     # Create webview window
     window = webview.create_window(
@@ -29,5 +38,7 @@ if __name__ == '__main__':
         resizable=False,
         js_api=sharif_api  # Use your existing API
     )
+    sharif_api.attach_window(window)
+    window.events.shown += lambda: startup.mark('window_shown')
     
     webview.start(debug=False)
@@ -8,6 +8,7 @@ class SharifConnectApp {
         this.isConnected = false
         this.isLoggedIn = false
         this.connectionState = -1
+        this.activeJobId = null
     }
 
     async init() {
@@ -17,15 +18,19 @@ class SharifConnectApp {
 
             // Check if pywebview is available
             if (typeof window.pywebview !== "undefined") {
+                this.reportFirstPaint()
+
+                // One bridge crossing: language and saved config
+                const [langData, config] = await Utils.batch([["get_language_data"], ["config_data"]])
 
                 // Initialize language manager
-                await languageManager.init()
+                await languageManager.init(langData)
 
                 // Check login status
                 await this.checkLoginStatus()
 
                 // Load initial configuration
-                await this.loadInitialConfig()
+                await this.loadInitialConfig(config)
 
             } else {
                 // Development mode - show login
@@ -41,9 +46,26 @@ class SharifConnectApp {
         }
     }
 
-    async loadInitialConfig() {
+    // Startup timing report: first paint, and when the Tailwind classes took effect (right away with the CSS
+    // precompiled by build.py, only after the in-browser compiler ran otherwise)
+    // Its own bridge call rather than part of the startup batch: it waits until the Tailwind classes apply
+    reportFirstPaint() {
+        const firstPaint = performance.now()
+        const build = window.STATIC_BUNDLE ? "dist" : "source"
+        const styled = () => getComputedStyle(document.body).backgroundColor === "rgb(243, 244, 246)" // bg-gray-100
+        const poll = () => {
+            if (styled() || performance.now() - firstPaint > 5000) {
+                window.pywebview.api.report_first_paint(firstPaint, build, performance.now())
+            } else {
+                requestAnimationFrame(poll)
+            }
+        }
+        poll()
+    }
+
+    async loadInitialConfig(config = null) {
         try {
-            const config = await window.pywebview.api.config_data()
+            config = config || (await window.pywebview.api.config_data())
             if (config.username && config.password) {
                 const usernameField = document.getElementById("username")
                 const passwordField = document.getElementById("password")
@@ -105,7 +127,7 @@ class SharifConnectApp {
 
         try {
             if (this.isConnected) {
-                const result = await window.pywebview.api.disconnect()
+                const result = await this.runJob("disconnect")
                 if (result.success) {
                     this.isConnected = false
                     this.updateConnectionUI(false)
@@ -116,7 +138,7 @@ class SharifConnectApp {
                     }
                 }
             } else {
-                const result = await window.pywebview.api.connect()
+                const result = await this.runJob("connect")
                 if (result.success) {
                     this.isConnected = true
                     this.updateConnectionUI(true)
@@ -135,17 +157,51 @@ class SharifConnectApp {
         }
     }
 
-    updateConnectionUI(connected) {
+    // Run a slow bridge call as a background job; repeated clicks join the job in flight
+    async runJob(name) {
+        const job = await window.pywebview.api.start_job(name)
+        if (!job.success) return job
+        this.activeJobId = job.job_id
+        try {
+            return await Utils.waitForJob(job.job_id)
+        } finally {
+            this.activeJobId = null
+        }
+    }
+
+    handleJobEvent(event) {
+        if (event.job_id !== this.activeJobId) return
+        const connectionText = document.getElementById("connection-text")
+        const steps = {
+            probing: "بررسی شبکه...",
+            authenticating: "احراز هویت...",
+            dialing: "اتصال VPN...",
+            fetching_ip: "دریافت آی‌پی...",
+            cancelling: "لغو اتصال...",
+            waiting: "در انتظار عملیات قبلی...",
+        }
+        if (connectionText && steps[event.step]) {
+            connectionText.textContent = steps[event.step]
+        }
+    }
+
+    // currentIp: result of current_ip() when the caller already has it (dashboard snapshot)
+    updateConnectionUI(connected, currentIp = null) {
         const toggleElement = document.getElementById("main-toggle")
         const statusIndicator = document.getElementById("status-indicator")
         const connectionText = document.getElementById("connection-text")
         const protectionCircle = document.getElementById("protection-circle")
         const currentIpElement = document.getElementById("current-ip")
-        window.pywebview.api.current_ip().then((current_ip) => {
+        const showIp = (current_ip) => {
             if (currentIpElement && current_ip.success && connected) {
                 currentIpElement.textContent = `آی‌پی شما: ${current_ip.ip}`
             }
-        })
+        }
+        if (currentIp) {
+            showIp(currentIp)
+        } else {
+            window.pywebview.api.current_ip().then(showIp)
+        }
         if (toggleElement) {
             const toggleButton = toggleElement.querySelector("div")
             if (connected) {
@@ -241,29 +297,34 @@ class SharifConnectApp {
             }
         // Update data usage every 5 seconds when connected
         setInterval(() => {
-            if (this.isConnected) {
+            if (this.isLoggedIn) {
                 this.updateDataUsage()
             }
         }, 5000)
 
-        // Update connection state every 10 seconds
+        // State changes are pushed from Python; this only re-reads the cached state as a safety net
         setInterval(() => {
             if (this.isLoggedIn) {
                 this.updateConnectionState()
             }
-        }, 3000)
+        }, 30000)
     }
 
-    updateDataUsage() {
+    async updateDataUsage() {
         const todayData = document.getElementById("today-data")
         const weekData = document.getElementById("week-data")
 
-        if (todayData && weekData) {
-            const currentMB = Number.parseInt(todayData.textContent) || 0
-            const currentGB = Number.parseFloat(weekData.textContent) || 0
-
-            todayData.textContent = currentMB + Math.floor(Math.random() * 10) + " MB"
-            weekData.textContent = (currentGB + Math.random() * 0.1).toFixed(1) + " GB"
+        if (todayData && weekData && typeof window.pywebview !== "undefined") {
+            try {
+                // Read from the local usage store, no network round-trip
+                const usage = await window.pywebview.api.usage_summary()
+                if (usage.success) {
+                    todayData.textContent = Utils.formatBytes(usage.data.today.total)
+                    weekData.textContent = Utils.formatBytes(usage.data.week.total)
+                }
+            } catch (error) {
+                console.error("Failed to load data usage:", error)
+            }
         }
     }
 
@@ -271,24 +332,29 @@ class SharifConnectApp {
         try {
             if (typeof window.pywebview !== "undefined") {
                 const state = await window.pywebview.api.update_state()
-                this.connectionState = state
-                navigationManager.updateConnectionStatus(state)
-
-                if (state === 1 || state === 2) {
-                    this.updateConnectionUI(true)
-                } else {
-                    this.updateConnectionUI(false)
-                }
+                this.applyConnectionState(state)
             }
         } catch (error) {
             console.error("Failed to update connection state:", error)
         }
     }
 
+    applyConnectionState(state, currentIp = null) {
+        this.connectionState = state
+        navigationManager.updateConnectionStatus(state)
+
+        if (state === 1 || state === 2) {
+            this.updateConnectionUI(true, currentIp)
+        } else {
+            this.updateConnectionUI(false)
+        }
+    }
+
 }
 
 // Global app instance
 const app = new SharifConnectApp()
+navigationManager.onConnectionState = (state, currentIp) => app.applyConnectionState(state, currentIp)
 
 
 // Global functions for HTML event handlers
@@ -308,6 +374,26 @@ window.handleChangeCredentials = (event) => {
     app.handleChangeCredentials(event)
 }
 
+// Called from Python once the public IP of a new connection is known
+window.onIpChanged = (ip) => {
+    const currentIpElement = document.getElementById("current-ip")
+    if (currentIpElement && app.isLoggedIn && (app.connectionState === 1 || app.connectionState === 2)) {
+        currentIpElement.textContent = `آی‌پی شما: ${ip}`
+    }
+}
+
+// Called from Python (SharifConnectAPI._on_state_change) whenever the connection state changes
+window.onConnectionStateChanged = (state) => {
+    if (app.isLoggedIn) {
+        app.applyConnectionState(state)
+    }
+}
+
+// Called from Python (SharifConnectAPI._push_job_event) for every progress step of a background job
+window.onJobEvent = (event) => {
+    app.handleJobEvent(event)
+}
+
 // Initialize app when DOM is loaded
 document.addEventListener("DOMContentLoaded", () => {
     app.init()
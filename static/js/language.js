@@ -5,10 +5,11 @@ export class LanguageManager {
     this.languageData = {}
   }
 
-  async init() {
+  // langData: result of get_language_data() when the caller already fetched it (e.g. in a batch)
+  async init(langData = null) {
     try {
       if (typeof window.pywebview !== "undefined") {
-        const langData = await window.pywebview.api.get_language_data()
+        langData = langData || (await window.pywebview.api.get_language_data())
         this.currentLanguage = langData.current
         this.languageData = langData.data
       }
@@ -7,6 +7,9 @@ export class NavigationManager {
         this.currentPage = "login"
         this.isMenuOpen = false
         this.pageCache = new Map()
+        this.logs = []
+        // Set by the app: applies a connection state (and the IP that came with it) to the whole UI
+        this.onConnectionState = null
     }
 
     async init() {
@@ -59,11 +62,11 @@ export class NavigationManager {
                 this.toggleMenu()
             }
 
+            // Translate the static labels first, so the data filled in afterwards is not overwritten
+            languageManager.updateLanguage()
+
             // Load page-specific data
             await this.loadPageData(pageName)
-
-            // Update language
-            languageManager.updateLanguage()
         } catch (error) {
             console.error("Failed to navigate to page:", error)
         }
@@ -87,6 +90,12 @@ export class NavigationManager {
                 case "about":
                     await this.loadAboutData()
                     break
+                case "diagnostics":
+                    await this.loadDiagnosticsData()
+                    break
+                case "settings":
+                    await this.loadSettingsData()
+                    break
             }
         } catch (error) {
             console.error(`Failed to load data for ${pageName}:`, error)
@@ -97,9 +106,23 @@ export class NavigationManager {
         // Load initial dashboard data
         if (typeof window.pywebview !== "undefined") {
             try {
-                const state = await window.pywebview.api.update_state()
+                // State, IP and usage in one bridge crossing
+                const snapshot = await window.pywebview.api.dashboard_snapshot()
+                if (!snapshot.success) return
                 // Update connection status based on state
-                this.updateConnectionStatus(state)
+                if (this.onConnectionState) {
+                    this.onConnectionState(snapshot.state, snapshot.ip)
+                } else {
+                    this.updateConnectionStatus(snapshot.state)
+                }
+
+                const usage = snapshot.usage
+                if (usage.success) {
+                    const todayData = document.getElementById("today-data")
+                    const weekData = document.getElementById("week-data")
+                    if (todayData) todayData.textContent = Utils.formatBytes(usage.data.today.total)
+                    if (weekData) weekData.textContent = Utils.formatBytes(usage.data.week.total)
+                }
             } catch (error) {
                 console.error("Failed to load dashboard data:", error)
             }
@@ -128,12 +151,15 @@ export class NavigationManager {
         }
     }
 
-    async loadLogsData() {
+    async loadLogsData(offset = 0) {
         if (typeof window.pywebview !== "undefined") {
             try {
-                const logs = await window.pywebview.api.get_logs()
+                const logs = await window.pywebview.api.get_logs(offset, 30)
                 if (logs.success){
-                this.updateLogsDisplay(logs.data)
+                this.logs = offset === 0 ? logs.data : this.logs.concat(logs.data)
+                this.updateLogsDisplay(this.logs)
+                const moreButton = document.getElementById("logs-more")
+                if (moreButton) moreButton.classList.toggle("hidden", !logs.has_more)
                 }
             } catch (error) {
                 console.error("Failed to load logs data:", error)
@@ -152,6 +178,33 @@ export class NavigationManager {
         }
     }
 
+    async loadSettingsData() {
+        if (typeof window.pywebview !== "undefined") {
+            try {
+                const settings = await window.pywebview.api.get_settings()
+                document.querySelectorAll("[data-setting]").forEach((toggle) => {
+                    const active = settings[toggle.dataset.setting] === true
+                    toggle.classList.toggle("active", active)
+                    const toggleButton = toggle.querySelector("div")
+                    if (toggleButton) toggleButton.style.transform = active ? "translateX(-1.5rem)" : "translateX(0)"
+                })
+            } catch (error) {
+                console.error("Failed to load settings:", error)
+            }
+        }
+    }
+
+    async loadDiagnosticsData() {
+        if (typeof window.pywebview !== "undefined") {
+            try {
+                const metrics = await window.pywebview.api.get_metrics()
+                this.updateDiagnosticsDisplay(metrics)
+            } catch (error) {
+                console.error("Failed to load diagnostics data:", error)
+            }
+        }
+    }
+
     updateConnectionStatus(state) {
         const statusIndicator = document.getElementById("status-indicator")
         const connectionText = document.getElementById("connection-text")
@@ -318,6 +371,48 @@ export class NavigationManager {
 }
 
 
+    updateDiagnosticsDisplay(metrics) {
+        const toggle = document.getElementById("metrics-enabled")
+        if (toggle) toggle.checked = metrics.enabled
+        const metricsList = document.getElementById("metrics-list")
+        if (!metricsList) return
+
+        const rows = Object.entries(metrics.histograms)
+        if (rows.length === 0) {
+            metricsList.innerHTML = '<p class="text-center text-gray-500 py-4" data-lang="no_metrics">هنوز زمانی ثبت نشده است</p>'
+            return
+        }
+
+        metricsList.innerHTML = `
+            <table class="min-w-full text-gray-700" dir="ltr">
+                <thead>
+                    <tr class="text-gray-500">
+                        <th class="text-left py-1">name</th>
+                        <th class="px-2">n</th>
+                        <th class="px-2">p50</th>
+                        <th class="px-2">p90</th>
+                        <th class="px-2">max</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    ${rows
+                        .map(
+                            ([name, h]) => `
+                        <tr class="border-t border-gray-100">
+                            <td class="py-1 break-all">${name}</td>
+                            <td class="px-2 text-center">${h.count}</td>
+                            <td class="px-2 text-center">${h.p50_ms}</td>
+                            <td class="px-2 text-center">${h.p90_ms}</td>
+                            <td class="px-2 text-center">${h.max_ms}</td>
+                        </tr>
+                    `,
+                        )
+                        .join("")}
+                </tbody>
+            </table>
+        `
+    }
+
     updateAboutDisplay(info) {
         const appInfo = document.getElementById("app-info")
         if (!appInfo) return
@@ -376,6 +471,42 @@ window.toggleMenu = () => {
     navigationManager.toggleMenu()
 }
 
+window.disconnectOtherSessions = async () => {
+    try {
+        const result = await window.pywebview.api.disconnect_other_sessions()
+        if (result.sessions) {
+            navigationManager.updateSessionsDisplay(result.sessions)
+        }
+        const count = (result.results || []).filter((r) => r.success).length
+        Utils.showNotification(`${count} جلسه قطع شد`, result.success ? "success" : "error")
+    } catch (error) {
+        console.error("Failed to disconnect sessions:", error)
+        Utils.showNotification("خطا در قطع جلسات", "error")
+    }
+}
+
+window.loadMoreLogs = () => {
+    navigationManager.loadLogsData(navigationManager.logs.length)
+}
+
 window.loadSessions = (count) => {
     navigationManager.loadSessionsData(Number.parseInt(count))
 }
+
+window.toggleMetrics = async (enabled) => {
+    try {
+        await window.pywebview.api.set_metrics_enabled(enabled)
+        await navigationManager.loadDiagnosticsData()
+    } catch (error) {
+        console.error("Failed to toggle metrics:", error)
+    }
+}
+
+window.exportMetrics = async () => {
+    try {
+        const result = await window.pywebview.api.export_metrics()
+        Utils.showNotification(result.success ? result.path : result.message, result.success ? "success" : "error")
+    } catch (error) {
+        console.error("Failed to export metrics:", error)
+    }
+}
@@ -1,6 +1,8 @@
 // Utility Functions
 export class Utils {
   static async loadHTML(url) {
+    // Inlined by build.py in the dist build
+    if (window.STATIC_BUNDLE && url in window.STATIC_BUNDLE) return window.STATIC_BUNDLE[url]
     try {
       const response = await fetch(url)
       return await response.text()
@@ -45,6 +47,35 @@ export class Utils {
     return `${minutes}m ${secs}s`
   }
 
+  // Run several bridge calls in one crossing: calls are [name, ...args]; resolves to the results in order
+  // (null for a call that failed)
+  static async batch(calls) {
+    const response = await window.pywebview.api.batch(calls)
+    return response.results.map((item) => {
+      if (item.error) {
+        console.error(`Batched call ${item.method} failed:`, item.error)
+        return null
+      }
+      return item.result
+    })
+  }
+
+  // Wait for a background job started with pywebview.api.start_job() and return its result
+  static async waitForJob(jobId, onEvent = null, interval = 300) {
+    let seen = 0
+    while (true) {
+      const status = await window.pywebview.api.job_status(jobId, seen)
+      if (!status.success) throw new Error(status.message)
+      if (onEvent) status.events.forEach(onEvent)
+      seen += status.events.length
+      if (status.status === "done") return status.result
+      if (status.status === "failed" || status.status === "cancelled") {
+        return { success: false, message: status.error || status.status }
+      }
+      await new Promise((resolve) => setTimeout(resolve, interval))
+    }
+  }
+
   static debounce(func, wait) {
     let timeout
     return function executedFunction(...args) {
@@ -0,0 +1,20 @@
+/** @type {import('tailwindcss').Config} */
+// Used by build.py; the theme is the one static/index.html gives the in-browser runtime.
+module.exports = {
+    content: [
+        "./static/index.html",
+        "./static/pages/*.html",
+        "./static/components/*.html",
+        // Pages are partly rendered from template strings; the runtime in js/ must not be scanned
+        "./static/js/{app,language,navigation,utils}.js",
+    ],
+    theme: {
+        extend: {
+            colors: {
+                'sharif-blue': '#1E40AF',
+                'sharif-green': '#10B981',
+                'sharif-gray': '#F3F4F6'
+            }
+        }
+    }
+}